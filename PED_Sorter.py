@@ -1,19 +1,10 @@
-import re
 import sys
-import json
 import os
 from pathlib import Path
-import logging
-from logging.handlers import RotatingFileHandler
-from datetime import datetime
-import shutil
+import threading
+import time
+import multiprocessing
 
-
-import pytesseract
-from pdf2image import convert_from_path
-from PIL import Image
-import tempfile
-import pandas as pd
 from PySide6 import QtWidgets, QtGui, QtCore
 from PySide6.QtWidgets import QPushButton, QHBoxLayout, QWidget
 from PySide6.QtCore import QProcess, QFileInfo
@@ -21,83 +12,361 @@ from PySide6.QtGui import QCursor, Qt
 
 from PED_design import Ui_MainWindow
 from tags_window_design import Ui_TagsWindow
+from ped_engine import (TagsManager, FileClassifier, ScanResults, ScanCache, OcrCache, CopyJournal,
+                        CopyEngine, Scanner, is_valid_new_name, setup_logging, warm_up, scan_report_path)
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 tesseract_path = os.path.join(current_dir, 'Tesseract-OCR', 'tesseract.exe')
 readme_path = os.path.join(current_dir, 'README.txt')
 
 
-class TagsManager:
-    def __init__(self):
-        self.exec_dir = Path(__file__).parent.absolute()
-        self.tags_file = self.exec_dir / 'file_types_base.json'
-        self.tags_data = self._load_tags()
-
-    def _load_tags(self):
-        """Загружает теги из файла или создает новый с дефолтными значениями"""
-        default_tags = {
-            "1": {
-                "type": "Локальная смета",
-                "name_tags": [
-                    "локальная смета",
-                    "лс",
-                    "лc"
-                ],
-                "internal_tags": [
-                    "локальная смета"
-                ],
-                "mask": "ЛС-ГС-ПНо-ПНл-ВЕРНН-КОММ"
-                },
-        }
+class ScanWorker(QtCore.QObject):
+    """Поиск (Scanner) в фоновом потоке. Результаты отправляются в окно сигналами"""
+    enumerated = QtCore.Signal(int, int, float)  # найдено файлов, пропущено фильтрами, секунд на обход
+    names_ready = QtCore.Signal(object)  # [предварительные данные по имени файла]
+    progress = QtCore.Signal(int, int, object)  # обработано, всего, [данные]
+    finished = QtCore.Signal(object)  # True - поиск прерван, False - завершен, None - ошибка
+
+    def __init__(self, scanner):
+        super().__init__()
+        self.scanner = scanner
+
+    def pause(self):
+        self.scanner.pause()
+
+    def resume(self):
+        self.scanner.resume()
+
+    def is_paused(self):
+        return self.scanner.is_paused()
+
+    def cancel(self):
+        self.scanner.cancel()
+
+    @QtCore.Slot()
+    def run(self):
+        cancelled = None
         try:
-            if not self.tags_file.exists():
-                os.makedirs(self.tags_file.parent, exist_ok=True)
-                self._save_tags(default_tags)
-                return default_tags
-            
-            with open(self.tags_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except Exception as e:
-            print(f"Ошибка загрузки тегов: {e}")
-            return default_tags
-
-    def _save_tags(self, data):
-        """Сохраняет теги в файл"""
-        with open(self.tags_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=4)
-
-    def get_type_data(self, type_id):
-        """Возвращает данные по типу файла"""
-        return self.tags_data.get(str(type_id))
-
-    def add_tag(self, type_id, new_tag, tag_area):
-        """Добавляет новый тег для типа"""
-        type_id = str(type_id)
-        if type_id not in self.tags_data:
+            cancelled = self.scanner.run(self.enumerated.emit, self.names_ready.emit, self.progress.emit)
+        except Exception:
+            self.scanner.classifier.logger.exception("Ошибка поиска")
+        finally:
+            self.finished.emit(cancelled)
+
+
+class CopyWorker(QtCore.QObject):
+    """Копирование файлов с новыми именами в фоновом потоке"""
+    PROGRESS_INTERVAL = 0.1
+
+    progress = QtCore.Signal(int)  # процент скопированных байт
+    finished = QtCore.Signal(object)  # {'success': .., 'verified': .., 'errors': .., 'skipped': ..}
+
+    def __init__(self, engine, operations, journal=None):
+        super().__init__()
+        self.engine = engine
+        self.operations = operations
+        self.journal = journal
+        self._cancelled = threading.Event()
+        self._last_emit = 0.0
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def _on_progress(self, done, total):
+        now = time.monotonic()
+        if now - self._last_emit >= self.PROGRESS_INTERVAL or done == total:
+            self._last_emit = now
+            self.progress.emit(done * 100 // total if total else 100)
+
+    @QtCore.Slot()
+    def run(self):
+        try:
+            results = self.engine.copy_all(self.operations, self._on_progress, self._cancelled, self.journal)
+        except OSError as e:
+            # журнал или манифест не удалось записать в папку назначения
+            self.engine.logger.error(f"Ошибка журнала копирования: {str(e)}")
+            results = {'success': 0, 'verified': 0, 'errors': len(self.operations), 'skipped': 0}
+        self.finished.emit(results)
+
+
+class FilesTableModel(QtCore.QAbstractTableModel):
+    """Модель таблицы результатов поверх записей ScanResults. Статусы строк
+    лежат в компактных массивах, а представление запрашивает только видимые ячейки"""
+    HEADERS = ['Имя (двойное нажатие - открыть)', 'Предполагаемый тип', 'Маска', 'Новое имя', 'Переименовать?']
+    FILENAME, TYPE, MASK, NEW_NAME, CHECK = range(5)
+    HEADER_BACKGROUND = QtGui.QColor(199, 199, 199)
+    PENDING, UNKNOWN, PARTIAL, INVALID, READY, DUPLICATE = range(6)
+    STATUS_COLORS = {
+        PENDING: QtGui.QColor(225, 225, 225), # серый - файл еще обрабатывается
+        UNKNOWN: QtGui.QColor(238, 186, 175), # красный - тип неизвестен
+        PARTIAL: QtGui.QColor(238, 223, 175), # желтый - тип предполагаем, но имя составили не доконца
+        INVALID: QtGui.QColor(238, 223, 175), # желтый - имя не подходит или повторяется
+        READY: QtGui.QColor(213, 238, 175), # зеленый - все сделал
+        DUPLICATE: QtGui.QColor(200, 222, 238), # голубой - копия другого файла, по умолчанию не копируем
+    }
+    TEXT_SOURCES = {
+        'layer': 'Текст PDF: текстовый слой',
+        'ocr_header': 'Текст PDF: распознана шапка страницы',
+        'ocr': 'Текст PDF: распознана вся страница',
+    }
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._reset_rows()
+
+    def _reset_rows(self):
+        self._records = []
+        self._names = []
+        self._base_status = bytearray()
+        self._status = bytearray()
+        self._checked = bytearray()
+        self._rows = dict()
+        self._name_rows = dict()
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self._records)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        if orientation != QtCore.Qt.Horizontal:
+            return super().headerData(section, orientation, role)
+        if role == QtCore.Qt.DisplayRole:
+            return self.HEADERS[section]
+        if role == QtCore.Qt.FontRole:
+            font = QtGui.QFont()
+            font.setBold(True)
+            return font
+        if role == QtCore.Qt.BackgroundRole and section in (self.FILENAME, self.TYPE, self.NEW_NAME):
+            return self.HEADER_BACKGROUND
+        return None
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row, column = index.row(), index.column()
+        record = self._records[row]
+        if role in (QtCore.Qt.DisplayRole, QtCore.Qt.EditRole):
+            if column == self.FILENAME:
+                return record.path
+            if column == self.TYPE:
+                return record.type
+            if column == self.MASK:
+                return record.mask
+            if column == self.NEW_NAME:
+                return self._names[row]
+            return None
+        if role == QtCore.Qt.BackgroundRole:
+            return self.STATUS_COLORS[self._status[row]]
+        if role == QtCore.Qt.CheckStateRole and column == self.CHECK:
+            return QtCore.Qt.Checked if self._checked[row] else QtCore.Qt.Unchecked
+        if role == QtCore.Qt.ToolTipRole and column == self.TYPE and record.text_source:
+            return self.TEXT_SOURCES[record.text_source]
+        if role == QtCore.Qt.ToolTipRole and column == self.FILENAME and record.duplicate_of:
+            return (f'Копия файла {record.duplicate_of} (первый такой файл по порядку обхода папок), '
+                    f'тип определен по нему. Чтобы скопировать и ее, отметьте строку')
+        return None
+
+    def flags(self, index):
+        flags = QtCore.Qt.ItemIsEnabled
+        if index.column() == self.NEW_NAME:
+            flags |= QtCore.Qt.ItemIsSelectable | QtCore.Qt.ItemIsEditable
+        elif index.column() == self.CHECK:
+            if self._status[index.row()] in (self.READY, self.DUPLICATE):
+                flags |= QtCore.Qt.ItemIsUserCheckable
+        else:
+            flags |= QtCore.Qt.ItemIsSelectable
+        return flags
+
+    def setData(self, index, value, role=QtCore.Qt.EditRole):
+        """Ручная правка нового имени (в том числе во время поиска) и чекбоксы"""
+        if not index.isValid():
             return False
-        if new_tag not in self.tags_data[type_id][tag_area]:
-            self.tags_data[type_id][tag_area].append(new_tag)
-            self._save_tags(self.tags_data)
+        row, column = index.row(), index.column()
+        if column == self.NEW_NAME and role == QtCore.Qt.EditRole:
+            self._records[row].edited_name = value
+            for affected_row in self._set_name(row, value):
+                self._refresh_status(affected_row)
+                self.dataChanged.emit(self.index(affected_row, 0), self.index(affected_row, self.CHECK))
             return True
-        return False
-
-    def remove_tag(self, type_id, tag_to_remove, tag_area):
-        """Удаляет тег у указанного типа"""
-        type_id = str(type_id)
-        if type_id in self.tags_data and tag_to_remove in self.tags_data[type_id][tag_area]:
-            self.tags_data[type_id][tag_area].remove(tag_to_remove)
-            self._save_tags(self.tags_data)
+        if column == self.CHECK and role == QtCore.Qt.CheckStateRole:
+            checked = QtCore.Qt.CheckState(value) == QtCore.Qt.Checked
+            if self._status[row] == self.DUPLICATE:
+                # отмеченная копия участвует в проверке уникальности, как обычный файл
+                if checked and not self.is_name_valid(self._names[row], row):
+                    return False
+                self._checked[row] = checked
+                for affected_row in self._set_name(row, self._names[row], checked) - {row}:
+                    self._refresh_status(affected_row)
+                    self.dataChanged.emit(self.index(affected_row, 0), self.index(affected_row, self.CHECK))
+            else:
+                self._checked[row] = checked
+            self.dataChanged.emit(index, index, [role])
             return True
         return False
 
-    def change_mask(self, type_id, new_mask):
-        type_id = str(type_id)
-        if type_id not in self.tags_data:
+    def clear(self):
+        self.beginResetModel()
+        self._reset_rows()
+        self.endResetModel()
+
+    def reset_records(self, records):
+        """Перестраивает таблицу целиком по записям ScanResults"""
+        self.beginResetModel()
+        self._reset_rows()
+        for record in records:
+            for row in self._append(record):
+                self._refresh_status(row)
+        self.endResetModel()
+
+    def set_records(self, records, only_new=False):
+        """Добавляет строки записей или обновляет уже показанные.
+        only_new - не трогать строки, которые уже есть в таблице"""
+        affected = set()
+        new = []
+        for record in records:
+            row = self._rows.get(record.path)
+            if row is None:
+                new.append(record)
+            elif not only_new:
+                affected |= self._store(row)
+        first = len(self._records)
+        if new:
+            self.beginInsertRows(QtCore.QModelIndex(), first, first + len(new) - 1)
+            for record in new:
+                affected |= self._append(record)
+        for row in affected:
+            self._refresh_status(row)
+        if new:
+            self.endInsertRows()
+        changed = [row for row in affected if row < first]
+        if changed:
+            self.dataChanged.emit(self.index(min(changed), 0), self.index(max(changed), self.CHECK))
+
+    def _append(self, record):
+        self._rows[record.path] = len(self._records)
+        self._records.append(record)
+        self._names.append('')
+        self._base_status.append(self.PENDING)
+        self._status.append(self.PENDING)
+        self._checked.append(False)
+        return self._store(len(self._records) - 1)
+
+    def _store(self, row):
+        """Пересчитывает строку по записи. Возвращает строки,
+        статус которых нужно пересчитать"""
+        record = self._records[row]
+        if record.pending:
+            self._base_status[row] = self.PENDING
+        elif record.duplicate_of:
+            self._base_status[row] = self.DUPLICATE
+        elif record.type == '?':
+            self._base_status[row] = self.UNKNOWN
+        elif '?' in record.new_name:
+            self._base_status[row] = self.PARTIAL
+        else:
+            self._base_status[row] = self.READY
+        # копии не участвуют в проверке уникальности, пока их не отметили или не исправили имя вручную
+        return self._set_name(row, record.final_name,
+                              not record.duplicate_of or record.edited_name is not None or bool(self._checked[row]))
+
+    def _set_name(self, row, name, indexed=True):
+        """Переносит строку в индексе имен. Возвращает саму строку и строки,
+        которые из-за этого стали дубликатами или перестали ими быть"""
+        affected = {row}
+        old_name = self._names[row]
+        if old_name == name and (row in self._name_rows.get(name, ())) == indexed:
+            return affected
+        old_rows = self._name_rows.get(old_name)
+        if old_rows is not None and row in old_rows:
+            old_rows.discard(row)
+            if len(old_rows) == 1:
+                affected.update(old_rows)
+            elif not old_rows:
+                del self._name_rows[old_name]
+        self._names[row] = name
+        if indexed:
+            rows = self._name_rows.setdefault(name, set())
+            rows.add(row)
+            if len(rows) == 2:
+                affected.update(rows)
+        return affected
+
+    def _is_duplicate(self, name, row):
+        rows = self._name_rows.get(name, ())
+        return len(rows) - (row in rows) > 0
+
+    def _refresh_status(self, row):
+        """Обновляет статус строки на основе нового имени файла.
+        Чекбокс сбрасывается, только если статус сменился"""
+        status = self._base_status[row]
+        if status == self.PENDING:
+            pass
+        elif self._records[row].edited_name is not None:
+            status = self.READY if self.is_name_valid(self._names[row], row) else self.INVALID
+        elif status == self.READY and self._is_duplicate(self._names[row], row):
+            status = self.INVALID
+        if status != self._status[row]:
+            self._status[row] = status
+            self._checked[row] = status == self.READY
+
+    def is_name_valid(self, new_name, current_row):
+        """Проверяет валидность нового имени"""
+        if self._is_duplicate(new_name, current_row):
+            return False
+        return is_valid_new_name(new_name, self._records[current_row].extension)
+
+    def record(self, row):
+        return self._records[row]
+
+    def status(self, row):
+        return self._status[row]
+
+    def is_checked(self, row):
+        return bool(self._checked[row])
+
+
+class FilesFilterProxyModel(QtCore.QSortFilterProxyModel):
+    """Сортировка таблицы по колонкам и фильтр по типу/имени и по статусу строки"""
+    STATUS_FILTERS = [
+        None, # все файлы
+        {FilesTableModel.READY},
+        {FilesTableModel.PARTIAL, FilesTableModel.INVALID},
+        {FilesTableModel.UNKNOWN},
+        {FilesTableModel.PENDING},
+        {FilesTableModel.DUPLICATE},
+    ]
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._text = ''
+        self._statuses = None
+        self.setDynamicSortFilter(True)
+
+    def set_text_filter(self, text):
+        self._text = text.strip().lower()
+        self.invalidateFilter()
+
+    def set_status_filter(self, index):
+        self._statuses = self.STATUS_FILTERS[index]
+        self.invalidateFilter()
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        model = self.sourceModel()
+        if self._statuses is not None and model.status(source_row) not in self._statuses:
             return False
-        self.tags_data[type_id]["mask"] = new_mask
-        self._save_tags(self.tags_data)
+        if self._text:
+            record = model.record(source_row)
+            return self._text in record.type.lower() or self._text in record.path.lower()
         return True
 
+    def lessThan(self, left, right):
+        if left.column() == FilesTableModel.CHECK:
+            model = self.sourceModel()
+            return model.is_checked(left.row()) < model.is_checked(right.row())
+        return super().lessThan(left, right)
+
 
 class TagsWindow(QtWidgets.QMainWindow):
     def __init__(self, type_id, tags_manager, parent=None):
@@ -145,6 +414,10 @@ class TagsWindow(QtWidgets.QMainWindow):
                     self.ui.tag_lineEdit.clear()
         else:
             new_tag = self.ui.tag_lineEdit_2.text().strip()
+            error = self.tags_manager.tag_error(new_tag)
+            if error is not None:
+                QtWidgets.QMessageBox.warning(self, "Ошибка", f"Неправильное регулярное выражение: {error}")
+                return
             if new_tag:
                 if self.tags_manager.add_tag(self.type_id, new_tag, tag_area):
                     self.ui.TagList_2.addItem(new_tag)
@@ -173,51 +446,53 @@ class PEDSorterApp(QtWidgets.QMainWindow):
         self.ui = Ui_MainWindow()
         self.ui.setupUi(self)
         
-        self.UNKNOWN = '?'
         self.logger = setup_logging()
-        self.filenames = dict()
+        self.scan_results = ScanResults()
+        self.file_globs = {'include': [], 'exclude': []}
+        self.scan_report = None
+        self.scan_report_path = None
+        self.scan_thread = None
+        self.scan_worker = None
+        self.copy_thread = None
+        self.copy_worker = None
+        self.copy_results = dict()
+        self.OCR_CACHE_MAX_BYTES = 200 * 1024 * 1024
+        self.WARM_UP_IMPORTS = True # загружать openpyxl/xlrd/pdf2image/pytesseract в фоне после показа окна
+        self.table_model = FilesTableModel(self)
+        self.table_proxy = FilesFilterProxyModel(self)
+        self.table_proxy.setSourceModel(self.table_model)
+        self.ui.Table.setModel(self.table_proxy)
+        self.ui.Table.horizontalHeader().setSortIndicator(-1, QtCore.Qt.AscendingOrder)
         self.ui.FilesList.itemDoubleClicked.connect(self._on_file_double_clicked)
         self.ui.ChoosePEDButton.clicked.connect(self.choose_ped)
-        self.ui.Table.cellDoubleClicked.connect(self.open_file_in_explorer)
-        self.ui.Table.cellChanged.connect(self.on_cell_changed)
+        self.ui.Table.doubleClicked.connect(self.open_file_in_explorer)
+        self.ui.filter_lineEdit.textChanged.connect(self.table_proxy.set_text_filter)
+        self.ui.status_comboBox.currentIndexChanged.connect(self.table_proxy.set_status_filter)
         self.ui.SearchButton.clicked.connect(self.traverse_directory)
+        self.ui.PauseButton.clicked.connect(self.toggle_pause)
+        self.ui.CancelButton.clicked.connect(self.cancel_scan)
+        self.ui.action_include_globs.triggered.connect(lambda: self._edit_file_globs('include'))
+        self.ui.action_exclude_globs.triggered.connect(lambda: self._edit_file_globs('exclude'))
+        self.ui.action_scan_report.triggered.connect(self.show_scan_report)
+        self.ui.action_scan_report.setEnabled(False)
         self.ui.Rename_Button.clicked.connect(self.rename_files)
         self.ui.instruction_Button.clicked.connect(self.show_instruction)
 
         self.table_is_full = False
         self.ui.Rename_Button.setEnabled(False)
 
+        self.ui.workers_spinBox.setMaximum(os.cpu_count() or 1)
+        self.ui.workers_spinBox.setValue(os.cpu_count() or 1)
+
         self.directory = ''
         self.tags_manager = TagsManager()
         self._populate_files_list()
-        
-        self.EX_NAME_LENGTH = 15
-        self.DEFAULT_VERSION = 'БАЗ'
-        self.DEFAULT_VERSION_NUMBER = ''
-        self.TYPES_7_AND_THEIR_CODENAMES = {
-            'Расчеты на прочие затраты': '?',
-            'Перевозка': "Перевозка",
-            'Командировочные расходы': "Командировочные",
-            'Перебазировка': 'Перебазировка',
-            'Затраты на охрану труда': 'ОхранаТруда',
-            'Затраты на проведение пусконаладочных работ (ПНР)': 'ПНР',
-            'Устройство дорог': 'УстройствоДорог',
-            'Дополнительные затраты при производстве работ в зимнее время (ЗУ)': 'ЗУ',
-            'Плата за негативное воздействие на окружающую среду (НВОС)': 'НВОС',
-            'Транспортировка': 'Транспортировка',
-            'Плавсредства': 'Плавсредства',
-            'Затраты на мониторинг компонентов окружающей среды (ПЭМ)': 'ПЭМ'
-        }
-        self.TYPES_8_AND_THEIR_CODENAMSE = {
-            'Подтверждающие документы': '?',
-            'Ведомость объемов работ': 'ВОР',
-            'Дефектная ведомость': 'ДВ',
-            'Коммерческое предложение': 'КП',
-            'Транспортная схема': 'ТС',
-            'Обоснование к расчету прочих затрат': 'ОбоснованиеПрочих',
-            'Конъюнктурный анализ': 'КА'
-        }
-        self.amount_of_documents_8_type = 0
+        if self.WARM_UP_IMPORTS:
+            # таймер сработает, когда окно уже показано и запущен цикл событий
+            QtCore.QTimer.singleShot(0, self._warm_up)
+
+    def _warm_up(self):
+        threading.Thread(target=warm_up, args=(self.logger,), name='warm-up', daemon=True).start()
 
     def show_instruction(self):
         try:
@@ -267,387 +542,200 @@ class PEDSorterApp(QtWidgets.QMainWindow):
             self.ui.SearchButton.setEnabled(False)
 
     def traverse_directory(self):
-        '''Обходит выбранную директорию и все поддиректории.'''
+        '''Запускает обход выбранной директории в фоновом потоке.'''
+        if self.scan_thread is not None:
+            return
         QtWidgets.QApplication.setOverrideCursor(QtGui.QCursor(QtCore.Qt.BusyCursor))
-        files_count = 0
         self.table_is_full = False
         self.ui.Rename_Button.setEnabled(False)
-        percent_processed = 0
-        self.filenames = dict()
-        for root, _, files in os.walk(self.directory):
-            for filename in files:
-                if os.path.basename(filename).startswith('~$'):
-                    continue
-                filepath = Path(root) / filename
-                extension = filepath.suffix.lower()
-                type = self.UNKNOWN
-                new_name = self.UNKNOWN
-                mask = self.UNKNOWN
-
-                # выяснить, что за тип:
-                for type_id, type_data in self.tags_manager.tags_data.items():
-                    if self.ui.search_in_name_checkBox.isChecked():
-                        file_parts = re.split(r'[_\-. ]+', filename.lower())
-                        if any(tag.lower() in file_parts for tag in type_data["name_tags"]): #распознавание тэгов в имени
-                            type = type_data["type"]
-                            mask = type_data["mask"]
-                            if type not in ['Подтверждающие документы', 'Расчеты на прочие затраты']:
-                                break
-                    if self.ui.search_in_file_checkBox.isChecked():
-                        presence_tags_in_file = self.check_if_tags_in_file(type_data["internal_tags"], filepath)
-                        if presence_tags_in_file:
-                            type = type_data["type"]
-                            mask = type_data["mask"]
-                            if type not in ['Подтверждающие документы', 'Расчеты на прочие затраты']:
-                                break
-
-                # создание имен:
-                if type == 'Локальная смета':
-                    new_name = self.create_name_for_1_local_estimate(filepath, filename)
-                if type == 'Объектная смета':
-                    new_name = self.create_name_for_2_object_estimate(filepath, filename)
-                if type == 'Сводный сметный расчет':
-                    new_name = self.create_name_for_3_summary_estimate(filepath, filename)
-                if type == 'Сводный реестр сметной документации':
-                    new_name = self.create_name_for_4_register_of_estimates(filepath, filename)
-                if type == 'Сметные расчеты на отдельные виды затрат':
-                    new_name = self.create_name_for_5_specific_types_of_costs(filepath, filename)
-                if type == 'Сравнительная таблица изменения стоимости МТР по договору подряда (Форма 1.3)':
-                    new_name = self.create_name_for_6_MTR_cost_change_table(filepath, filename)
-                if type in self.TYPES_7_AND_THEIR_CODENAMES.keys():
-                    new_name = self.create_name_for_7_other_expenses(filename, type)
-                if type in self.TYPES_8_AND_THEIR_CODENAMSE.keys():
-                    new_name = self.create_name_for_8_supporting_documents(filename, type)
-
-                self.filenames[filename] = {
-                    'type': type,
-                    'new_name': new_name,
-                    'mask': mask,
-                    'extension': extension,
-                    'filepath': filepath
-                    }
-                files_count += 1
-                percent_processed = files_count * 100 // len(files)
-                self.ui.progressBar.setValue(percent_processed)
-                self.ui.loading_label.setText(f'Обработано файлов: {files_count}')
-                QtWidgets.QApplication.processEvents()
-        self.share_info_from_xls_to_duplicates()
+        self.ui.SearchButton.setEnabled(False)
+        self.ui.PauseButton.setEnabled(True)
+        self.ui.PauseButton.setText('Пауза')
+        self.ui.CancelButton.setEnabled(True)
+        self.ui.progressBar.setValue(0)
+        self.ui.loading_label.setText('Поиск файлов...')
+        self.scan_results = ScanResults(self.directory)
+        self.table_model.clear()
+
+        classifier = FileClassifier(
+            self.tags_manager.snapshot(), self.logger,
+            search_in_name=self.ui.search_in_name_checkBox.isChecked(),
+            search_in_file=self.ui.search_in_file_checkBox.isChecked(),
+            ocr_cache=OcrCache(self.tags_manager.exec_dir / 'ocr_cache.sqlite', self.OCR_CACHE_MAX_BYTES))
+        scan_cache = ScanCache(self.tags_manager.exec_dir / 'scan_cache.sqlite', classifier.config_key(),
+                               logger=self.logger)
+        scanner = Scanner(
+            self.directory, classifier, self.ui.workers_spinBox.value(),
+            scan_cache=scan_cache, full_rescan=self.ui.action_full_rescan.isChecked(),
+            include=self.file_globs['include'], exclude=self.file_globs['exclude'])
+        self.scan_report = scanner.report
+        self.scan_worker = ScanWorker(scanner)
+        self.scan_thread = QtCore.QThread(self)
+        self.scan_worker.moveToThread(self.scan_thread)
+        self.scan_thread.started.connect(self.scan_worker.run)
+        self.scan_worker.enumerated.connect(self._on_files_enumerated)
+        self.scan_worker.names_ready.connect(self._on_names_ready)
+        self.scan_worker.progress.connect(self._on_scan_progress)
+        self.scan_worker.finished.connect(self._on_scan_finished)
+        self.scan_worker.finished.connect(self.scan_thread.quit)
+        self.scan_thread.finished.connect(self.scan_worker.deleteLater)
+        self.scan_thread.finished.connect(self.scan_thread.deleteLater)
+        self.scan_thread.start()
+
+    def _edit_file_globs(self, kind):
+        """Маски файлов для поиска: включение или исключение по имени или относительному пути"""
+        titles = {'include': 'Искать только файлы по маске', 'exclude': 'Исключить файлы по маске'}
+        labels = {'include': 'Маски через ";", например: *.pdf; Архив/*\n'
+                             'Картинки и архивы ищутся, только если указать их маской: *.pdf; *.jpg; *.tif',
+                  'exclude': 'Маски через ";", например: *.pdf; Архив/*'}
+        text, ok = QtWidgets.QInputDialog.getText(
+            self, titles[kind], labels[kind], text='; '.join(self.file_globs[kind]))
+        if ok:
+            self.file_globs[kind] = [pattern.strip() for pattern in text.split(';') if pattern.strip()]
+
+    def _on_files_enumerated(self, found, skipped, seconds):
+        """Обход директории закончен, дальше идет определение типов"""
+        self.logger.info(f"Обход директории: найдено файлов {found}, пропущено фильтрами {skipped} ({seconds:.2f} с)")
+        self.ui.loading_label.setText(f'Найдено файлов: {found}')
+
+    def _on_names_ready(self, batch):
+        """Показывает предварительные результаты по именам файлов, пока идет поиск"""
+        started = time.perf_counter()
+        self.table_model.set_records([self.scan_results.put(data, replace=False) for data in batch], only_new=True)
+        self.scan_report.add('table', time.perf_counter() - started)
+
+    def _on_scan_progress(self, files_count, total, batch):
+        """Принимает от фонового потока пачку обработанных файлов
+        и обновляет их строки в таблице"""
+        started = time.perf_counter()
+        self.table_model.set_records([self.scan_results.put(data) for data in batch])
+        self.scan_report.add('table', time.perf_counter() - started)
+        if total:
+            self.ui.progressBar.setValue(files_count * 100 // total)
+        self.ui.loading_label.setText(f'Обработано файлов: {files_count} из {total}')
+
+    def _on_scan_finished(self, cancelled):
+        """Завершение поиска: заполняет таблицу тем, что успели обработать"""
+        self.scan_thread = None
+        self.scan_worker = None
+        self.ui.SearchButton.setEnabled(bool(self.directory))
+        self.ui.PauseButton.setEnabled(False)
+        self.ui.PauseButton.setText('Пауза')
+        self.ui.CancelButton.setEnabled(False)
+        self.scan_results.share_xls_info()
+        started = time.perf_counter()
         self.populate_table()
-
-    def extract_text_from_pdf_first_page(self, pdf_path, lang='rus+eng'):
-        """
-        Извлекает текст с первой страницы PDF используя OCR
-        """
-        try:
-            images = convert_from_path(pdf_path, first_page=1, last_page=1, dpi=300)
-            if not images:
-                return ""
-
-            with tempfile.NamedTemporaryFile(suffix='.jpg', delete=False) as temp_file:
-                images[0].save(temp_file.name, 'JPEG')
-                temp_image_path = temp_file.name
-
-            text = pytesseract.image_to_string(Image.open(temp_image_path), lang=lang)
-
-            os.unlink(temp_image_path)
-            
-            return text.lower()
-            
-        except Exception as e:
-            print(f"Ошибка OCR обработки {pdf_path}: {str(e)}")
-            return ""
-
-    def check_tags_in_pdf(self, pdf_path, tags):
-        """
-        Проверяет наличие тегов в PDF файле
-        """
-        # Извлекаем текст с первой страницы
-        pdf_text = self.extract_text_from_pdf_first_page(pdf_path)
-        
-        if not pdf_text:
-            return False
-        
-        # Проверяем каждый тег
-        for tag in tags:
-            # Если тег - регулярное выражение
-            if isinstance(tag, str) and any(c in tag for c in ['[', '(', '*', '+', '?', '{', '}']):
-                try:
-                    if re.search(tag, pdf_text, re.IGNORECASE):
-                        return True
-                except re.error:
-                    # Если regex невалиден, ищем как обычный текст
-                    if tag.lower() in pdf_text:
-                        return True
-            else:
-                # Обычный текстовый поиск
-                if tag.lower() in pdf_text:
-                    return True
-        
-        return False
-
-    def check_if_tags_in_file(self, internal_tags, filepath):
-        """Проверяет, встречаются ли тэги в файле (поддерживает PDF и Excel)"""
-        
-        # Для PDF файлов используем OCR
-        if str(filepath).lower().endswith('.pdf'):
-            return self.check_tags_in_pdf(filepath, internal_tags)
-        
-        # Для Excel файлов - обычная обработка
-        file = self.read_xls_xlsx_file(filepath)
-        if file is not None and not file.empty:
-            for i in range(len(file)):
-                row_data = ''.join([str(x).lower() for x in file.iloc[i].values.tolist() if pd.notna(x)])
-                for tag in internal_tags:
-                    try:
-                        if re.search(tag, row_data, re.IGNORECASE):
-                            return row_data
-                    except re.error:
-                        if tag.lower() in row_data:
-                            return row_data
-        return False
-
-    def share_info_from_xls_to_duplicates(self):
-        """Если находятся файлы одинакового имени, но разного расширения, эта функция
-        передаст инфу о типе и новом имени от xls файла тёскам других расширений"""
-        for filename, data in self.filenames.items():
-            ext = data['extension']
-            if ext in ['.xls', '.xlsx']:
-                name_without_ext = os.path.splitext(filename)[0]
-                for filename2, data2 in self.filenames.items():
-                    if os.path.splitext(filename2)[0] == name_without_ext and filename != filename2:
-                        data2['new_name'] = data['new_name']
-                        data2['type'] = data['type']
-                        data2['mask'] = data['mask']
-
-    def read_xls_xlsx_file(self, filepath):
-        if os.path.basename(filepath).startswith('~$'):
-            return None
-        if not os.path.exists(filepath):
-            self.logger.error(f'Файл не существует: {filepath}')
-            return None
-        try:
-            if str(filepath).lower().endswith('.xlsx'):
-                return self._read_xlsx_visible_sheet(filepath)
-            elif str(filepath).lower().endswith('.xls'):
-                return self._read_xls_visible_sheet(filepath)
-            else:
-                return None
-        except Exception as e:
-            self.logger.error(f"Ошибка чтения файла {filepath}: {str(e)}")
-            return None
-
-    def _read_xlsx_visible_sheet(self, filepath):
-        """Чтение первого видимого листа для xlsx с проверкой sheet_state"""
-        try:
-            from openpyxl import load_workbook
-            wb = load_workbook(filepath, read_only=True)
-            # Ищем первый видимый лист
-            visible_sheet_name = None
-            for sheet_name in wb.sheetnames:
-                sheet = wb[sheet_name]
-                if sheet.sheet_state == 'visible':
-                    visible_sheet_name = sheet_name
-                    break
-            # Если не нашли видимый, берем первый несистемный
-            if visible_sheet_name is None:
-                for sheet_name in wb.sheetnames:
-                    if not sheet_name.startswith('_'):
-                        visible_sheet_name = sheet_name
-                        break
-            if visible_sheet_name is None:
-                self.logger.warning(f"Не найдено видимых листов в {filepath}")
-                return None
-            return pd.read_excel(filepath, sheet_name=visible_sheet_name, header=None, engine='openpyxl')
-        except ImportError:
-            return self._read_fallback(filepath, 'openpyxl')
-
-    def _read_xls_visible_sheet(self, filepath):
-        """Чтение первого видимого листа для xls (эвристический подход)"""
+        self.scan_report.add('table', time.perf_counter() - started)
+        self._log_scan_stats()
+        self._save_scan_report()
+        if cancelled is None:
+            done = sum(not record.pending for record in self.scan_results)
+            self.ui.loading_label.setText(f'Ошибка поиска! обработано файлов: {done}')
+            QtWidgets.QMessageBox.warning(self, "Ошибка", "Поиск остановлен из-за ошибки, подробности в логе.")
+        elif cancelled:
+            done = sum(not record.pending for record in self.scan_results)
+            self.ui.loading_label.setText(f'Поиск прерван! обработано файлов: {done}')
+
+    def _log_scan_stats(self):
+        """Пишет в лог, сколько файлов определил каждый этап поиска,
+        и сколько PDF прочитано по текстовому слою, по шапке и по всей странице"""
+        stages = {'name': 'имя', 'content': 'содержимое', 'ocr': 'OCR'}
+        parts = []
+        for stage, title in stages.items():
+            runs = sum(stage in record.stages for record in self.scan_results)
+            hits = sum(record.stage == stage for record in self.scan_results)
+            if runs:
+                parts.append(f"{title} - определено {hits}, не определено {runs - hits}")
+        if parts:
+            self.logger.info("Этапы поиска: " + "; ".join(parts))
+        sources = [record.text_source for record in self.scan_results]
+        layer, header, ocr = sources.count('layer'), sources.count('ocr_header'), sources.count('ocr')
+        if layer or header or ocr:
+            self.logger.info(f"PDF: текстовый слой - {layer}, OCR шапки - {header}, OCR страницы - {ocr} "
+                             f"({layer * 100 // (layer + header + ocr)}% без OCR)")
+        self.logger.info(f"Время поиска: {self.scan_report.wall:.2f} с")
+
+    def _save_scan_report(self):
+        """Сохраняет отчет о времени этапов поиска рядом с дневным логом"""
+        self.ui.action_scan_report.setEnabled(True)
+        path = scan_report_path()
         try:
-            excel_file = pd.ExcelFile(filepath, engine='xlrd')
-            # Эвристика: исключаем системные и технические листы
-            system_keywords = ['_', 'sheet', 'hidden', 'veryhidden', 'sys', 'temp']
-            for sheet_name in excel_file.sheet_names:
-                sheet_lower = sheet_name.lower()
-                # Пропускаем системные листы
-                if any(keyword in sheet_lower for keyword in system_keywords):
-                    continue
-                # Пропускаем листы с подозрительными именами
-                if sheet_lower.startswith(('~', '$')) or len(sheet_name.strip()) == 0:
-                    continue
-                # Пробуем прочитать лист
-                try:
-                    sheet_data = pd.read_excel(filepath, sheet_name=sheet_name, header=None, engine='xlrd')
-                    if not sheet_data.empty:
-                        return sheet_data
-                except:
-                    continue
-            # Fallback: первый несистемный лист
-            for sheet_name in excel_file.sheet_names:
-                if not sheet_name.startswith('_'):
-                    return pd.read_excel(filepath, sheet_name=sheet_name, header=None, engine='xlrd')
-            return None
-        except Exception as e:
-            self.logger.error(f"Ошибка чтения XLS {filepath}: {str(e)}")
-            return None
-
-    def _read_fallback(self, filepath, engine):
-        """Резервный метод чтения"""
-        try:
-            excel_file = pd.ExcelFile(filepath, engine=engine)
-        
-            # Простой фильтр системных листов
-            for sheet_name in excel_file.sheet_names:
-                if not sheet_name.startswith('_'):
-                    return pd.read_excel(filepath, sheet_name=sheet_name, header=None, engine=engine)
-                
-            return None
-        except:
-            return None
+            self.scan_report.save(path)
+        except OSError as e:
+            self.logger.warning(f"Не удалось сохранить отчет о поиске: {str(e)}")
+            self.scan_report_path = None
+            return
+        self.scan_report_path = path
+        self.logger.info(f"Отчет о поиске: {path}")
 
-    def create_name_for_1_local_estimate(self, filepath, filename):
-        """Создает новое имя для локальной сметы: """
-        TARGET_TEXT = ['локальн', 'смета', 'сметный']
-        ESTIMATE_NUMBER_UNKNOWN = '??-??-??'
-        estimate_number = ESTIMATE_NUMBER_UNKNOWN
-        version = self.DEFAULT_VERSION
-        version_number = self.DEFAULT_VERSION_NUMBER
-        const = 'ЛС'
-        file = self.read_xls_xlsx_file(filepath)
-        lines_to_chek = 20 #в скольких первых строках искать совпадения. весь файл = len(file)
-        if file is not None and not file.empty:
-            for i in range(lines_to_chek):
-                row_data = ''.join([str(x).lower() for x in file.iloc[i].values.tolist() if pd.notna(x)])
-                for tag in list(map(lambda x: x.lower(), TARGET_TEXT)):
-                    if tag in row_data:
-                        if '№' in row_data:
-                            number = row_data.split('№')[-1].strip()
-                            if re.search(r'^\d{1,2}-\d{1,2}(?:-\d{1,2})?$', number):
-                                estimate_number = number
-                                break
-        return f'{const}-{estimate_number}-{version}{version_number}-(ex. {filename[:self.EX_NAME_LENGTH]}..)'
-
-    def create_name_for_2_object_estimate(self, filepath, filename):
-        """Создает новое имя для объектной сметы: """
-        TARGET_TEXT = ['объектн', 'смета', 'сметный']
-        ESTIMATE_NUMBER_UNKNOWN = '??-??'
-        estimate_number = ESTIMATE_NUMBER_UNKNOWN
-        DEFAULT_VERSION = 'БАЗ'
-        version = DEFAULT_VERSION
-        version_number = self.DEFAULT_VERSION_NUMBER
-        const = 'ОС'
-        file = self.read_xls_xlsx_file(filepath)
-        lines_to_chek = 20 #в скольких первых строках искать совпадения. весь файл = len(file)
-        if file is not None and not file.empty:
-            for i in range(lines_to_chek):
-                row_data = ''.join([str(x).lower() for x in file.iloc[i].values.tolist() if pd.notna(x)])
-                for tag in list(map(lambda x: x.lower(), TARGET_TEXT)):
-                    if tag in row_data:
-                        if '№' in row_data:
-                            number = row_data.split('№')[-1].strip()
-                            if re.search(r'^\d{1,2}(?:-\d{1,2})?$', number):
-                                estimate_number = number
-                                break
-        return f'{const}-{estimate_number}-{version}{version_number}-(ex. {filename[:self.EX_NAME_LENGTH]}..)'
-
-    def create_name_for_3_summary_estimate(self, filepath, filename):
-        """Создает новое имя для сводного сметного расчета: """
-        TARGET_TEXT = ['сводн', 'смета', 'сметный']
-        ESTIMATE_NUMBER_UNKNOWN = '??'
-        estimate_number = ESTIMATE_NUMBER_UNKNOWN
-        version = self.DEFAULT_VERSION
-        version_number = self.DEFAULT_VERSION_NUMBER
-        const = 'ССР'
-        file = self.read_xls_xlsx_file(filepath)
-        lines_to_chek = 20 #в скольких первых строках искать совпадения. весь файл = len(file)
-        if file is not None and not file.empty:
-            for i in range(lines_to_chek):
-                row_data = ''.join([str(x).lower() for x in file.iloc[i].values.tolist() if pd.notna(x)])
-                for tag in list(map(lambda x: x.lower(), TARGET_TEXT)):
-                    if tag in row_data:
-                        if '№' in row_data:
-                            number = row_data.split('№')[-1].strip()
-                            if re.search(r'^\d{1,2}$', number):
-                                estimate_number = number
-                                break
-        return f'{const}-{estimate_number}-{version}{version_number}-(ex. {filename[:self.EX_NAME_LENGTH]}..)'
-
-    def create_name_for_4_register_of_estimates(self, filepath, filename):
-        version = self.DEFAULT_VERSION
-        const = 'СРСД'
-        version_number = self.DEFAULT_VERSION_NUMBER
-        return f'{const}-{version}{version_number}-(ex. {filename[:self.EX_NAME_LENGTH]}..)'
-
-    def create_name_for_5_specific_types_of_costs(self, filepath, filename):
-        version = self.DEFAULT_VERSION
-        const = 'СРОВЗ'
-        version_number = self.DEFAULT_VERSION_NUMBER
-        return f'{const}-{version}{version_number}-(ex. {filename[:self.EX_NAME_LENGTH]}..)'
-    
-    def create_name_for_6_MTR_cost_change_table(self, filepath, filename):
-        version = self.DEFAULT_VERSION
-        const = 'ФОРМА1.3'
-        version_number = self.DEFAULT_VERSION_NUMBER
-        return f'{const}-{version}{version_number}-(ex. {filename[:self.EX_NAME_LENGTH]}..)'
-    
-    def create_name_for_7_other_expenses(self, filename, type):
-        version = self.DEFAULT_VERSION
-        const = 'ПРОЧ'
-        version_number = self.DEFAULT_VERSION_NUMBER
-        type_of_calculation = self.TYPES_7_AND_THEIR_CODENAMES[type]
-        return f'{const}-{type_of_calculation}-{version}{version_number}-(ex. {filename[:self.EX_NAME_LENGTH]}...)'
-
-    def create_name_for_8_supporting_documents(self, filename, type):
-        version = self.DEFAULT_VERSION
-        const = 'ПОДТВ'
-        version_number = self.DEFAULT_VERSION_NUMBER
-        type_of_document = self.TYPES_8_AND_THEIR_CODENAMSE[type]
-        self.amount_of_documents_8_type += 1
-        if type_of_document == 'Обоснование к расчету прочих затрат':
-            return f'{const}-{type_of_document}-ТИППРОЧ-{self.amount_of_documents_8_type}-{version}{version_number}-(ex. {filename[:self.EX_NAME_LENGTH]}...)'
+    def show_scan_report(self):
+        """Окно с временем этапов последнего поиска и самыми долгими файлами"""
+        if self.scan_report is None:
+            return
+        dialog = QtWidgets.QDialog(self)
+        dialog.setWindowTitle('Отчет о последнем поиске')
+        dialog.resize(900, 500)
+        layout = QtWidgets.QVBoxLayout(dialog)
+        text = QtWidgets.QPlainTextEdit(dialog)
+        text.setReadOnly(True)
+        text.setLineWrapMode(QtWidgets.QPlainTextEdit.NoWrap)
+        text.setFont(QtGui.QFontDatabase.systemFont(QtGui.QFontDatabase.FixedFont))
+        text.setPlainText(self.scan_report.format())
+        layout.addWidget(text)
+        if self.scan_report_path:
+            layout.addWidget(QtWidgets.QLabel(f'Сохранен в {os.path.abspath(self.scan_report_path)}', dialog))
+        buttons = QtWidgets.QDialogButtonBox(QtWidgets.QDialogButtonBox.Close, dialog)
+        buttons.rejected.connect(dialog.reject)
+        layout.addWidget(buttons)
+        dialog.exec()
+
+    def toggle_pause(self):
+        """Приостанавливает или продолжает поиск"""
+        if self.scan_worker is None:
+            return
+        if self.scan_worker.is_paused():
+            self.scan_worker.resume()
+            self.ui.PauseButton.setText('Пауза')
         else:
-            return f'{const}-{type_of_document}-{self.amount_of_documents_8_type}-{version}{version_number}-(ex. {filename[:self.EX_NAME_LENGTH]}...)'
+            self.scan_worker.pause()
+            self.ui.PauseButton.setText('Продолжить')
+
+    def cancel_scan(self):
+        """Прерывает поиск или копирование"""
+        if self.scan_worker is not None:
+            self.scan_worker.cancel()
+            self.ui.CancelButton.setEnabled(False)
+            self.ui.PauseButton.setEnabled(False)
+        if self.copy_worker is not None:
+            self.copy_worker.cancel()
+            self.ui.CancelButton.setEnabled(False)
+
+    def closeEvent(self, event):
+        if self.scan_thread is not None:
+            self.scan_worker.cancel()
+            self.scan_thread.quit()
+            self.scan_thread.wait()
+        if self.copy_thread is not None:
+            self.copy_worker.cancel()
+            self.copy_thread.quit()
+            self.copy_thread.wait()
+        super().closeEvent(event)
 
     def populate_table(self):
         '''Заполняет таблицу найденными файлами.'''
-        self.ui.Table.setRowCount(len(self.filenames))
-        for row, (filename, data) in enumerate(self.filenames.items()):
-            self.ui.Table.setItem(row, 0, QtWidgets.QTableWidgetItem(filename))
-            self.ui.Table.setItem(row, 1, QtWidgets.QTableWidgetItem(data['type']))
-            self.ui.Table.setItem(row, 2, QtWidgets.QTableWidgetItem(data['mask']))
-            self.ui.Table.setItem(row, 3, QtWidgets.QTableWidgetItem(data['new_name'] + data['extension']))
-
-            #ЦВЕТА и чекбоксы!
-            checkbox_item = QtWidgets.QTableWidgetItem()
-            if data['type'] == '?': # красный - тип неизвестен
-                checkbox_item.setFlags(QtCore.Qt.ItemIsEnabled)
-                checkbox_item.setCheckState(QtCore.Qt.Unchecked)
-                color = QtGui.QColor(238, 186, 175)
-            elif '?' in data['new_name']: # желтый - тип предполагаем, но имя составили не доконца
-                checkbox_item.setFlags(QtCore.Qt.ItemIsEnabled)
-                checkbox_item.setCheckState(QtCore.Qt.Unchecked)
-                color = QtGui.QColor(238, 223, 175) 
-            else: # зеленый - все сделал
-                checkbox_item.setFlags(QtCore.Qt.ItemIsUserCheckable | QtCore.Qt.ItemIsEnabled)
-                checkbox_item.setCheckState(QtCore.Qt.Checked)
-                color = QtGui.QColor(213, 238, 175)
-            self.ui.Table.setItem(row, 4, checkbox_item)
-            for col in range(self.ui.Table.columnCount()):
-                self.ui.Table.item(row, col).setBackground(color)
+        self.table_model.reset_records(record for record in self.scan_results if not record.pending)
 
         self.setCursor(QtGui.QCursor(QtCore.Qt.ArrowCursor))
         QtWidgets.QApplication.restoreOverrideCursor()
-        self.ui.loading_label.setText(f'Готово! всего файлов: {len(self.filenames.keys())}')
+        self.ui.loading_label.setText(f'Готово! всего файлов: {self.table_model.rowCount()}')
         self.table_is_full = True
-        self.amount_of_documents_8_type = 0
         self.ui.Rename_Button.setEnabled(True)
     
-    def open_file_in_explorer(self, row, column):
+    def open_file_in_explorer(self, index):
         '''Открывает файл в проводнике при двойном клике на имя файла (колонка 0)'''
-        if column == 0:
-            filename_item = self.ui.Table.item(row, column)
-            if filename_item:
-                file_path = self.filenames[filename_item.text()]['filepath']
+        index = self.table_proxy.mapToSource(index)
+        if index.column() == FilesTableModel.FILENAME:
+            file_path = self.scan_results.full_path(self.table_model.record(index.row()))
             if os.path.exists(file_path):
                 if sys.platform == 'win32':
                     import subprocess
@@ -655,71 +743,11 @@ class PEDSorterApp(QtWidgets.QMainWindow):
             else:
                 QtWidgets.QMessageBox.warning(self, 'Ошибка', f'Файл не найден:\n{file_path}')
 
-    def on_cell_changed(self, row, column):
-        """Обрабатывает изменения в ячейках таблицы"""
-        if column == 3 and self.table_is_full:  # Изменился 3-й столбец (новые имена)
-            self.update_row_status(row)
-
-    def update_row_status(self, row):
-        """Обновляет статус строки на основе нового имени файла"""
-        name_item = self.ui.Table.item(row, 3)
-        if not name_item:
-            return
-        new_name = name_item.text()
-        is_valid = self.is_name_valid(new_name, row)
-        checkbox_item = self.ui.Table.item(row, 4)
-        if not checkbox_item:
-            return
-        if is_valid:
-            color = QtGui.QColor(213, 238, 175)  # Зеленый
-            checkbox_item.setFlags(QtCore.Qt.ItemIsUserCheckable | QtCore.Qt.ItemIsEnabled)
-            checkbox_item.setCheckState(QtCore.Qt.Checked)
-        else:
-            color = QtGui.QColor(238, 223, 175)  # Желтый
-            checkbox_item.setFlags(QtCore.Qt.ItemIsEnabled)  # Только для просмотра
-            checkbox_item.setCheckState(QtCore.Qt.Unchecked)
-
-        for col in range(self.ui.Table.columnCount()):
-            item = self.ui.Table.item(row, col)
-            if item:
-                item.setBackground(color)
-
-    def is_name_valid(self, new_name, current_row):
-        """Проверяет валидность нового имени"""
-        if not new_name.strip():
-            return False
-        if '?' in new_name:
-            return False
-        for row in range(self.ui.Table.rowCount()):
-            if row == current_row:
-                continue
-            item = self.ui.Table.item(row, 3)
-            if item and item.text() == new_name:
-                return False
-        if not re.match(r'^[a-zA-Zа-яА-ЯёЁ0-9_\-\.\(\) ]+$', new_name):
-            return False
-
-        original_name_item = self.ui.Table.item(current_row, 0)
-        if not original_name_item:
-            return False
-
-        original_name = original_name_item.text()
-        original_extension = os.path.splitext(original_name)[1].lower()
-
-        new_extension = os.path.splitext(new_name)[1].lower()
-        if new_extension != original_extension:
-            return False
-
-        new_name_without_ext = os.path.splitext(new_name)[0]
-        if not new_name_without_ext.strip():
-            return False
-
-        if new_name_without_ext == '.' or new_name_without_ext == '':
-            return False
-        return True
-
     def rename_files(self):
-        """Копирует файлы с новыми именами"""
+        """Копирует файлы с новыми именами: сначала составляет план копирования
+        и один раз спрашивает про уже существующие файлы, потом копирует в фоне"""
+        if self.copy_thread is not None or self.scan_thread is not None:
+            return
         target_dir = QtWidgets.QFileDialog.getExistingDirectory(
             self, "Выберите папку для сохранения"
         )
@@ -728,110 +756,102 @@ class PEDSorterApp(QtWidgets.QMainWindow):
             return
         
         target_path = Path(target_dir)
-        results = {'success': 0, 'errors': 0, 'skipped': 0}
+        results = {'success': 0, 'verified': 0, 'errors': 0, 'skipped': 0}
+        operations = []
         
-        for row in range(self.ui.Table.rowCount()):
+        for row in range(self.table_model.rowCount()):
             # Пропускаем неотмеченные строки
-            checkbox_item = self.ui.Table.item(row, 4)
-            if not checkbox_item or checkbox_item.checkState() != QtCore.Qt.Checked:
+            if not self.table_model.is_checked(row):
                 results['skipped'] += 1
                 continue
             
             # Получаем имена
-            original_name_item = self.ui.Table.item(row, 0)
-            new_name_item = self.ui.Table.item(row, 3)
-            
-            if not original_name_item or not new_name_item:
-                results['errors'] += 1
-                continue
-            
-            original_name = original_name_item.text()
-            new_name = new_name_item.text()
+            record = self.table_model.record(row)
+            new_name = record.final_name
 
-            if not self.is_name_valid(new_name, row):
+            if not self.table_model.is_name_valid(new_name, row):
                 results['errors'] += 1
                 continue
 
-            # Проверяем наличие файла в словаре
-            if original_name not in self.filenames:
-                self.logger.error(f"Файл {original_name} не найден")
-                results['errors'] += 1
-                continue
-            
-            file_info = self.filenames[original_name]
-            source_path = Path(file_info['filepath'])
+            source_path = self.scan_results.full_path(record)
             
             # Проверяем исходный файл
-            if not source_path.exists():
+            if not os.path.exists(source_path):
                 self.logger.error(f"Файл не существует: {source_path}")
                 results['errors'] += 1
                 continue
-            
-            # Создаем целевую директорию если не существует
-            target_path.mkdir(exist_ok=True)
-            
-            # Копируем файл
-            try:
-                target_file_path = target_path / new_name
-                
-                # Обработка дубликатов
-                if target_file_path.exists():
-                    reply = QtWidgets.QMessageBox.question(
-                        self, "Файл существует",
-                        f"Файл {new_name} уже существует. Перезаписать?",
-                        QtWidgets.QMessageBox.Yes | QtWidgets.QMessageBox.No
-                    )
-                    if reply == QtWidgets.QMessageBox.No:
-                        results['skipped'] += 1
-                        continue
-                
-                shutil.copy2(source_path, target_file_path)
-                results['success'] += 1
-                self.logger.info(f"Скопирован: {original_name} -> {new_name}")
-                
-            except Exception as e:
-                self.logger.error(f"Ошибка: {original_name} -> {new_name}: {str(e)}")
-                results['errors'] += 1
-        
-        # Отчет о результатах
+
+            operations.append((source_path, str(target_path / new_name), f'{record.path} -> {new_name}'))
+
+        # Обработка дубликатов - одним вопросом на все файлы. Файлы, которые
+        # по журналу уже скопированы прошлым запуском, не спрашиваем
+        journal = CopyJournal(target_path)
+        try:
+            journal.load()
+        except OSError as e:
+            self.logger.error(f"Не удалось прочитать журнал копирования: {str(e)}")
+            journal = None
+        existing = {os.path.normcase(name) for name in os.listdir(target_path)} if target_path.is_dir() else set()
+        conflicts = [operation for operation in operations
+                     if os.path.normcase(os.path.basename(operation[1])) in existing
+                     and not (journal is not None and journal.is_done(operation[0], operation[1]))]
+        if conflicts:
+            box = QtWidgets.QMessageBox(
+                QtWidgets.QMessageBox.Question, "Файлы существуют",
+                f"Файлов, которые уже есть в папке: {len(conflicts)}. Перезаписать их?",
+                QtWidgets.QMessageBox.YesToAll | QtWidgets.QMessageBox.NoToAll | QtWidgets.QMessageBox.Cancel,
+                self)
+            box.setDetailedText('\n'.join(os.path.basename(operation[1]) for operation in conflicts))
+            reply = box.exec()
+            if reply == QtWidgets.QMessageBox.Cancel:
+                return
+            if reply == QtWidgets.QMessageBox.NoToAll:
+                conflict_targets = {operation[1] for operation in conflicts}
+                operations = [operation for operation in operations if operation[1] not in conflict_targets]
+                results['skipped'] += len(conflicts)
+
+        # Создаем целевую директорию если не существует
+        target_path.mkdir(exist_ok=True)
+
+        self.copy_results = results
+        self.ui.Rename_Button.setEnabled(False)
+        self.ui.SearchButton.setEnabled(False)
+        self.ui.CancelButton.setEnabled(True)
+        self.ui.progressBar.setValue(0)
+        self.ui.loading_label.setText(f'Копирование файлов: {len(operations)}')
+        self.copy_worker = CopyWorker(CopyEngine(self.logger), operations, journal)
+        self.copy_thread = QtCore.QThread(self)
+        self.copy_worker.moveToThread(self.copy_thread)
+        self.copy_thread.started.connect(self.copy_worker.run)
+        self.copy_worker.progress.connect(self.ui.progressBar.setValue)
+        self.copy_worker.finished.connect(self._on_copy_finished)
+        self.copy_worker.finished.connect(self.copy_thread.quit)
+        self.copy_thread.finished.connect(self.copy_worker.deleteLater)
+        self.copy_thread.finished.connect(self.copy_thread.deleteLater)
+        self.copy_thread.start()
+
+    def _on_copy_finished(self, copy_results):
+        """Отчет о результатах копирования"""
+        self.copy_thread = None
+        self.copy_worker = None
+        results = self.copy_results
+        for key, value in copy_results.items():
+            results[key] += value
+        self.ui.Rename_Button.setEnabled(True)
+        self.ui.SearchButton.setEnabled(bool(self.directory))
+        self.ui.CancelButton.setEnabled(False)
+        self.ui.loading_label.setText(f'Скопировано файлов: {results["success"]}')
         msg = (
             f"Операция завершена:\n"
             f"Успешно: {results['success']}\n"
+            f"Уже скопировано ранее: {results['verified']}\n"
             f"Ошибок: {results['errors']}\n"
             f"Пропущено: {results['skipped']}"
         )
         QtWidgets.QMessageBox.information(self, "Результат", msg)
 
-
-def setup_logging():
-    """Настройки логирования."""
-    log_dir = "logs"
-    if not os.path.exists(log_dir):
-        os.makedirs(log_dir)
-
-    log_file = os.path.join(log_dir, f"ped_sorter_{datetime.now().strftime('%Y%m%d')}.log")
-
-    logger = logging.getLogger("PEDSorter")
-    logger.setLevel(logging.DEBUG)
-
-    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-
-    file_handler = RotatingFileHandler(
-        log_file, maxBytes=5*1024*1024, backupCount=3, encoding='utf-8'
-    )
-    file_handler.setFormatter(formatter)
-
-    console_handler = logging.StreamHandler()
-    console_handler.setFormatter(formatter)
-
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
-
-    return logger
-
-
 def main():
-    
+    multiprocessing.freeze_support()
     app = QtWidgets.QApplication(sys.argv)
     window = PEDSorterApp() 
     window.show()
@@ -11,15 +11,16 @@
 from PySide6.QtCore import (QCoreApplication, QDate, QDateTime, QLocale,
     QMetaObject, QObject, QPoint, QRect,
     QSize, QTime, QUrl, Qt)
-from PySide6.QtGui import (QBrush, QColor, QConicalGradient, QCursor,
-    QFont, QFontDatabase, QGradient, QIcon,
-    QImage, QKeySequence, QLinearGradient, QPainter,
-    QPalette, QPixmap, QRadialGradient, QTransform)
-from PySide6.QtWidgets import (QApplication, QCheckBox, QFrame, QHeaderView,
-    QLabel, QListWidget, QListWidgetItem, QMainWindow,
-    QMenuBar, QProgressBar, QPushButton, QRadioButton,
-    QSizePolicy, QStatusBar, QTableWidget, QTableWidgetItem,
-    QWidget)
+from PySide6.QtGui import (QAction, QBrush, QColor, QConicalGradient,
+    QCursor, QFont, QFontDatabase, QGradient,
+    QIcon, QImage, QKeySequence, QLinearGradient,
+    QPainter, QPalette, QPixmap, QRadialGradient,
+    QTransform)
+from PySide6.QtWidgets import (QApplication, QCheckBox, QComboBox, QFrame,
+    QHeaderView, QLabel, QLineEdit, QListWidget,
+    QListWidgetItem, QMainWindow, QMenu, QMenuBar,
+    QProgressBar, QPushButton, QRadioButton, QSizePolicy,
+    QSpinBox, QStatusBar, QTableView, QWidget)
 
 class Ui_MainWindow(object):
     def setupUi(self, MainWindow):
@@ -28,6 +29,15 @@ class Ui_MainWindow(object):
         MainWindow.resize(1500, 820)
         MainWindow.setMinimumSize(QSize(1500, 820))
         MainWindow.setMaximumSize(QSize(1500, 820))
+        self.action_full_rescan = QAction(MainWindow)
+        self.action_full_rescan.setObjectName(u"action_full_rescan")
+        self.action_full_rescan.setCheckable(True)
+        self.action_include_globs = QAction(MainWindow)
+        self.action_include_globs.setObjectName(u"action_include_globs")
+        self.action_exclude_globs = QAction(MainWindow)
+        self.action_exclude_globs.setObjectName(u"action_exclude_globs")
+        self.action_scan_report = QAction(MainWindow)
+        self.action_scan_report.setObjectName(u"action_scan_report")
         self.centralwidget = QWidget(MainWindow)
         self.centralwidget.setObjectName(u"centralwidget")
         self.centralwidget.setCursor(QCursor(Qt.CursorShape.ArrowCursor))
@@ -75,32 +85,26 @@ class Ui_MainWindow(object):
         self.label_9 = QLabel(self.files_frame)
         self.label_9.setObjectName(u"label_9")
         self.label_9.setGeometry(QRect(320, 10, 141, 21))
-        self.Table = QTableWidget(self.files_frame)
-        if (self.Table.columnCount() < 5):
-            self.Table.setColumnCount(5)
-        __qtablewidgetitem = QTableWidgetItem()
-        __qtablewidgetitem.setFont(font);
-        __qtablewidgetitem.setBackground(QColor(199, 199, 199));
-        self.Table.setHorizontalHeaderItem(0, __qtablewidgetitem)
-        __qtablewidgetitem1 = QTableWidgetItem()
-        __qtablewidgetitem1.setFont(font);
-        __qtablewidgetitem1.setBackground(QColor(199, 199, 199));
-        self.Table.setHorizontalHeaderItem(1, __qtablewidgetitem1)
-        __qtablewidgetitem2 = QTableWidgetItem()
-        __qtablewidgetitem2.setFont(font);
-        self.Table.setHorizontalHeaderItem(2, __qtablewidgetitem2)
-        __qtablewidgetitem3 = QTableWidgetItem()
-        __qtablewidgetitem3.setFont(font);
-        __qtablewidgetitem3.setBackground(QColor(199, 199, 199));
-        self.Table.setHorizontalHeaderItem(3, __qtablewidgetitem3)
-        __qtablewidgetitem4 = QTableWidgetItem()
-        __qtablewidgetitem4.setFont(font);
-        self.Table.setHorizontalHeaderItem(4, __qtablewidgetitem4)
+        self.Table = QTableView(self.files_frame)
         self.Table.setObjectName(u"Table")
         self.Table.setGeometry(QRect(320, 50, 1131, 611))
         self.Table.setHorizontalScrollBarPolicy(Qt.ScrollBarAsNeeded)
         self.Table.setAlternatingRowColors(True)
+        self.Table.setSortingEnabled(True)
         self.Table.horizontalHeader().setDefaultSectionSize(180)
+        self.filter_lineEdit = QLineEdit(self.files_frame)
+        self.filter_lineEdit.setObjectName(u"filter_lineEdit")
+        self.filter_lineEdit.setGeometry(QRect(900, 15, 271, 25))
+        self.filter_lineEdit.setClearButtonEnabled(True)
+        self.status_comboBox = QComboBox(self.files_frame)
+        self.status_comboBox.addItem("")
+        self.status_comboBox.addItem("")
+        self.status_comboBox.addItem("")
+        self.status_comboBox.addItem("")
+        self.status_comboBox.addItem("")
+        self.status_comboBox.addItem("")
+        self.status_comboBox.setObjectName(u"status_comboBox")
+        self.status_comboBox.setGeometry(QRect(1180, 15, 271, 25))
         self.FilesList = QListWidget(self.files_frame)
         QListWidgetItem(self.FilesList)
         self.FilesList.setObjectName(u"FilesList")
@@ -165,15 +169,39 @@ class Ui_MainWindow(object):
         self.progressBar.setGeometry(QRect(10, 50, 81, 23))
         self.progressBar.setValue(0)
         self.progressBar.setTextVisible(False)
+        self.PauseButton = QPushButton(self.frame_3)
+        self.PauseButton.setObjectName(u"PauseButton")
+        self.PauseButton.setEnabled(False)
+        self.PauseButton.setGeometry(QRect(100, 48, 81, 25))
+        self.PauseButton.setCursor(QCursor(Qt.CursorShape.PointingHandCursor))
+        self.CancelButton = QPushButton(self.frame_3)
+        self.CancelButton.setObjectName(u"CancelButton")
+        self.CancelButton.setEnabled(False)
+        self.CancelButton.setGeometry(QRect(190, 48, 81, 25))
+        self.CancelButton.setCursor(QCursor(Qt.CursorShape.PointingHandCursor))
+        self.workers_spinBox = QSpinBox(self.frame_3)
+        self.workers_spinBox.setObjectName(u"workers_spinBox")
+        self.workers_spinBox.setGeometry(QRect(280, 48, 71, 25))
+        self.workers_spinBox.setMinimum(1)
         MainWindow.setCentralWidget(self.centralwidget)
         self.menubar = QMenuBar(MainWindow)
         self.menubar.setObjectName(u"menubar")
         self.menubar.setGeometry(QRect(0, 0, 1500, 21))
+        self.menu_search = QMenu(self.menubar)
+        self.menu_search.setObjectName(u"menu_search")
         MainWindow.setMenuBar(self.menubar)
         self.statusbar = QStatusBar(MainWindow)
         self.statusbar.setObjectName(u"statusbar")
         MainWindow.setStatusBar(self.statusbar)
 
+        self.menubar.addAction(self.menu_search.menuAction())
+        self.menu_search.addAction(self.action_full_rescan)
+        self.menu_search.addSeparator()
+        self.menu_search.addAction(self.action_include_globs)
+        self.menu_search.addAction(self.action_exclude_globs)
+        self.menu_search.addSeparator()
+        self.menu_search.addAction(self.action_scan_report)
+
         self.retranslateUi(MainWindow)
 
         QMetaObject.connectSlotsByName(MainWindow)
@@ -181,23 +209,16 @@ class Ui_MainWindow(object):
 
     def retranslateUi(self, MainWindow):
         MainWindow.setWindowTitle(QCoreApplication.translate("MainWindow", u"\u041e\u0431\u0440\u0430\u0431\u043e\u0442\u0447\u0438\u043a \u043f\u0430\u043a\u0435\u0442\u043e\u0432 \u0441\u043c\u0435\u0442\u043d\u043e\u0439 \u0434\u043e\u043a\u0443\u043c\u0435\u043d\u0442\u0430\u0446\u0438\u0438", None))
+        self.action_full_rescan.setText(QCoreApplication.translate("MainWindow", u"\u041f\u043e\u043b\u043d\u044b\u0439 \u043f\u043e\u0438\u0441\u043a \u0431\u0435\u0437 \u043a\u044d\u0448\u0430", None))
+        self.action_include_globs.setText(QCoreApplication.translate("MainWindow", u"\u0418\u0441\u043a\u0430\u0442\u044c \u0442\u043e\u043b\u044c\u043a\u043e \u0444\u0430\u0439\u043b\u044b \u043f\u043e \u043c\u0430\u0441\u043a\u0435...", None))
+        self.action_exclude_globs.setText(QCoreApplication.translate("MainWindow", u"\u0418\u0441\u043a\u043b\u044e\u0447\u0438\u0442\u044c \u0444\u0430\u0439\u043b\u044b \u043f\u043e \u043c\u0430\u0441\u043a\u0435...", None))
+        self.action_scan_report.setText(QCoreApplication.translate("MainWindow", u"\u041e\u0442\u0447\u0435\u0442 \u043e \u043f\u043e\u0441\u043b\u0435\u0434\u043d\u0435\u043c \u043f\u043e\u0438\u0441\u043a\u0435...", None))
         self.DirectoryName.setText(QCoreApplication.translate("MainWindow", u"...", None))
         self.ChoosePEDButton.setText(QCoreApplication.translate("MainWindow", u"\u0412\u044b\u0431\u0440\u0430\u0442\u044c \u041f\u0421\u0414", None))
         self.label_7.setText(QCoreApplication.translate("MainWindow", u"\u0412\u044b\u0431\u0440\u0430\u043d\u043d\u0430\u044f \u0434\u0438\u0440\u0440\u0435\u043a\u0442\u043e\u0440\u0438\u044f:", None))
         self.instruction_Button.setText(QCoreApplication.translate("MainWindow", u"\u0418\u043d\u0441\u0442\u0440\u0443\u043a\u0446\u0438\u044f", None))
         self.label_8.setText(QCoreApplication.translate("MainWindow", u"\u041f\u0435\u0440\u0435\u0447\u0435\u043d\u044c \u0444\u0430\u0439\u043b\u043e\u0432 \u043f\u0430\u043a\u0435\u0442\u0430 \u0441\u043c\u0435\u0442\u043d\u043e\u0439 \u0434\u043e\u043a\u0443\u043c\u0435\u043d\u0442\u0430\u0446\u0438\u0438:", None))
         self.label_9.setText(QCoreApplication.translate("MainWindow", u"\u041e\u0431\u043d\u0430\u0440\u0443\u0436\u0435\u043d\u043d\u044b\u0435 \u0444\u0430\u0439\u043b\u044b:", None))
-        ___qtablewidgetitem = self.Table.horizontalHeaderItem(0)
-        ___qtablewidgetitem.setText(QCoreApplication.translate("MainWindow", u"\u0418\u043c\u044f (\u0434\u0432\u043e\u0439\u043d\u043e\u0435 \u043d\u0430\u0436\u0430\u0442\u0438\u0435 - \u043e\u0442\u043a\u0440\u044b\u0442\u044c)", None));
-        ___qtablewidgetitem1 = self.Table.horizontalHeaderItem(1)
-        ___qtablewidgetitem1.setText(QCoreApplication.translate("MainWindow", u"\u041f\u0440\u0435\u0434\u043f\u043e\u043b\u0430\u0433\u0430\u0435\u043c\u044b\u0439 \u0442\u0438\u043f", None));
-        ___qtablewidgetitem2 = self.Table.horizontalHeaderItem(2)
-        ___qtablewidgetitem2.setText(QCoreApplication.translate("MainWindow", u"\u041c\u0430\u0441\u043a\u0430", None));
-        ___qtablewidgetitem3 = self.Table.horizontalHeaderItem(3)
-        ___qtablewidgetitem3.setText(QCoreApplication.translate("MainWindow", u"\u041d\u043e\u0432\u043e\u0435 \u0438\u043c\u044f", None));
-        ___qtablewidgetitem4 = self.Table.horizontalHeaderItem(4)
-        ___qtablewidgetitem4.setText(QCoreApplication.translate("MainWindow", u"\u041f\u0435\u0440\u0435\u0438\u043c\u0435\u043d\u043e\u0432\u0430\u0442\u044c?", None));
-
         __sortingEnabled = self.FilesList.isSortingEnabled()
         self.FilesList.setSortingEnabled(False)
         ___qlistwidgetitem = self.FilesList.item(0)
@@ -206,11 +227,26 @@ class Ui_MainWindow(object):
 
         self.label_10.setText(QCoreApplication.translate("MainWindow", u"(\u0434\u0432\u043e\u0439\u043d\u043e\u0439 \u043a\u043b\u0438\u043a \u0434\u043b\u044f \u043d\u0430\u0441\u0442\u0440\u043e\u0439\u043a\u0438 \u0442\u044d\u0433\u043e\u0432)", None))
         self.loading_label.setText("")
+        self.filter_lineEdit.setPlaceholderText(QCoreApplication.translate("MainWindow", u"\u0424\u0438\u043b\u044c\u0442\u0440 \u043f\u043e \u0442\u0438\u043f\u0443 \u0438\u043b\u0438 \u0438\u043c\u0435\u043d\u0438", None))
+        self.status_comboBox.setItemText(0, QCoreApplication.translate("MainWindow", u"\u0412\u0441\u0435 \u0444\u0430\u0439\u043b\u044b", None))
+        self.status_comboBox.setItemText(1, QCoreApplication.translate("MainWindow", u"\u0413\u043e\u0442\u043e\u0432\u044b\u0435 \u043a \u043f\u0435\u0440\u0435\u0438\u043c\u0435\u043d\u043e\u0432\u0430\u043d\u0438\u044e", None))
+        self.status_comboBox.setItemText(2, QCoreApplication.translate("MainWindow", u"\u0422\u0440\u0435\u0431\u0443\u044e\u0442 \u043f\u0440\u043e\u0432\u0435\u0440\u043a\u0438", None))
+        self.status_comboBox.setItemText(3, QCoreApplication.translate("MainWindow", u"\u0422\u0438\u043f \u043d\u0435 \u043e\u043f\u0440\u0435\u0434\u0435\u043b\u0451\u043d", None))
+        self.status_comboBox.setItemText(4, QCoreApplication.translate("MainWindow", u"\u0412 \u043e\u0431\u0440\u0430\u0431\u043e\u0442\u043a\u0435", None))
+        self.status_comboBox.setItemText(5, QCoreApplication.translate("MainWindow", u"\u041a\u043e\u043f\u0438\u0438 \u0434\u0440\u0443\u0433\u0438\u0445 \u0444\u0430\u0439\u043b\u043e\u0432", None))
+
         self.Rename_Button.setText(QCoreApplication.translate("MainWindow", u"\u041f\u0435\u0440\u0435\u0438\u043c\u0435\u043d\u043e\u0432\u0430\u0442\u044c", None))
         self.SearchButton.setText(QCoreApplication.translate("MainWindow", u"\u0418\u0441\u043a\u0430\u0442\u044c", None))
         self.search_in_name_checkBox.setText(QCoreApplication.translate("MainWindow", u"\u0438\u0441\u043a\u0430\u0442\u044c \u043f\u043e \u0442\u044d\u0433\u0430\u043c \u0432 \u0438\u043c\u0435\u043d\u0438 \u0444\u0430\u0439\u043b\u0430", None))
         self.search_in_file_checkBox.setText(QCoreApplication.translate("MainWindow", u"\u0438\u0441\u043a\u0430\u0442\u044c \u043f\u043e \u0442\u044d\u0433\u0430\u043c \u0432 \u0441\u043e\u0434\u0435\u0440\u0436\u0438\u043c\u043e\u043c \u0444\u0430\u0439\u043b\u0430", None))
         self.rename_radioButton.setText(QCoreApplication.translate("MainWindow", u"\u043f\u0435\u0440\u0435\u0438\u043c\u0435\u043d\u043e\u0432\u0430\u0442\u044c \u044d\u0442\u0438 \u0444\u0430\u0439\u043b\u044b", None))
         self.rename_radioButton_2.setText(QCoreApplication.translate("MainWindow", u"\u0441\u043e\u0437\u0434\u0430\u0442\u044c \u043d\u043e\u0432\u0443\u044e \u0434\u0438\u0440\u0440\u0435\u043a\u0442\u043e\u0440\u0438\u044e \u0441 \u043a\u043e\u043f\u0438\u044f\u043c\u0438", None))
+        self.PauseButton.setText(QCoreApplication.translate("MainWindow", u"\u041f\u0430\u0443\u0437\u0430", None))
+        self.CancelButton.setText(QCoreApplication.translate("MainWindow", u"\u041e\u0442\u043c\u0435\u043d\u0430", None))
+#if QT_CONFIG(tooltip)
+        self.workers_spinBox.setToolTip(QCoreApplication.translate("MainWindow", u"\u0427\u0438\u0441\u043b\u043e \u043f\u0440\u043e\u0446\u0435\u0441\u0441\u043e\u0432 \u043f\u043e\u0438\u0441\u043a\u0430", None))
+#endif // QT_CONFIG(tooltip)
+        self.workers_spinBox.setSuffix(QCoreApplication.translate("MainWindow", u" \u043f\u0440\u043e\u0446.", None))
+        self.menu_search.setTitle(QCoreApplication.translate("MainWindow", u"\u041f\u043e\u0438\u0441\u043a", None))
     # retranslateUi
 
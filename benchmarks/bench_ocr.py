@@ -0,0 +1,68 @@
+"""Сравнение времени и текста OCR первой страницы PDF: старый путь через временный JPEG
+и текущий (страница передается в Tesseract из памяти, в оттенках серого).
+Сходство - доля совпадающего текста (difflib), 100% - распознано одинаково.
+
+Запуск: python benchmarks/bench_ocr.py файл1.pdf [файл2.pdf ...] [--repeat N]
+"""
+import os
+import sys
+import time
+import logging
+import argparse
+import difflib
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytesseract
+from pdf2image import convert_from_path
+from PIL import Image
+
+from ped_engine import FileClassifier, TagsManager
+
+
+def ocr_via_temp_jpeg(pdf_path, lang='rus+eng'):
+    """Прежняя реализация extract_text_from_pdf_first_page"""
+    images = convert_from_path(pdf_path, first_page=1, last_page=1, dpi=300)
+    with tempfile.NamedTemporaryFile(suffix='.jpg', delete=False) as temp_file:
+        images[0].save(temp_file.name, 'JPEG')
+        temp_image_path = temp_file.name
+    text = pytesseract.image_to_string(Image.open(temp_image_path), lang=lang)
+    os.unlink(temp_image_path)
+    return text.lower()
+
+
+def measure(function, pdf_path, repeat):
+    """Лучшее время из repeat запусков и распознанный текст"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        text = function(pdf_path)
+        timings.append(time.perf_counter() - start)
+    return min(timings), text
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('pdf', nargs='+')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    classifier = FileClassifier(TagsManager(), logging.getLogger('bench'))
+    total_old = total_new = total_similarity = 0
+    for pdf_path in args.pdf:
+        old, old_text = measure(ocr_via_temp_jpeg, pdf_path, args.repeat)
+        new, new_text = measure(lambda path: classifier._ocr_first_page(path, 'rus+eng'), pdf_path, args.repeat)
+        similarity = difflib.SequenceMatcher(None, old_text, new_text).ratio()
+        total_old += old
+        total_new += new
+        total_similarity += similarity
+        print(f'{os.path.basename(pdf_path)}: JPEG {old * 1000:.0f} мс, из памяти {new * 1000:.0f} мс, '
+              f'экономия {(old - new) * 1000:.0f} мс, сходство текста {similarity:.1%}')
+    count = len(args.pdf)
+    print(f'В среднем на страницу: JPEG {total_old / count * 1000:.0f} мс, '
+          f'из памяти {total_new / count * 1000:.0f} мс, экономия {(total_old - total_new) / count * 1000:.0f} мс, '
+          f'сходство текста {total_similarity / count:.1%}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""Время импорта модулей программы при запуске (разбор вывода python -X importtime).
+Показывает самые долгие импорты и проверяет, что тяжелые библиотеки
+(ped_engine.LAZY_MODULES) не загружаются до первого файла.
+
+Запуск: python benchmarks/bench_startup.py [модуль ...] [--repeat N] [--top N]
+По умолчанию меряются ped_engine и PED_Sorter.
+"""
+import os
+import sys
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ped_engine import LAZY_MODULES
+
+
+def import_times(module):
+    """Один холодный импорт module в отдельном процессе.
+    Возвращает [(модуль, собственное время, накопленное время в мкс, вложенность)]"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise SystemExit(f'{module}: {result.stderr.strip().splitlines()[-1]}')
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        entries.append((name.strip(), int(self_us), int(cumulative_us),
+                        (len(name) - len(name.lstrip())) // 2))
+    return entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('modules', nargs='*', default=['ped_engine', 'PED_Sorter'])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args()
+
+    for module in args.modules:
+        runs = [import_times(module) for _ in range(args.repeat)]
+        # лучший из запусков - меньше всего шума от диска и планировщика
+        best = min(runs, key=lambda entries: entries[-1][2])
+        total = next(cumulative for name, _, cumulative, _ in reversed(best) if name == module)
+        print(f'{module}: {total / 1000:.1f} мс (лучший из {args.repeat})')
+        top_level = sorted((entry for entry in best if entry[3] == 1 and entry[0] != module),
+                           key=lambda entry: entry[2], reverse=True)
+        for name, _, cumulative, _ in top_level[:args.top]:
+            print(f'    {cumulative / 1000:8.1f} мс  {name}')
+        loaded = {name for name, _, _, _ in best}
+        eager = [name for name in LAZY_MODULES if name in loaded]
+        if eager:
+            print(f'    загружаются при запуске: {", ".join(eager)}')
+
+
+if __name__ == '__main__':
+    main()
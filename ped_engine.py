@@ -0,0 +1,2201 @@
+"""Поиск, определение типов, новые имена и копирование файлов ПСД без Qt.
+
+Используется окном PED_Sorter и командной строкой:
+    python -m ped_engine scan ПАПКА
+    python -m ped_engine rename ПАПКА ПАПКА_КОПИЙ [--dry-run]
+    python -m ped_engine export ПАПКА ФАЙЛ.csv|ФАЙЛ.jsonl
+"""
+import re
+import sys
+import csv
+import copy
+import json
+import os
+import argparse
+from pathlib import Path
+import logging
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
+from datetime import datetime
+from collections import Counter, OrderedDict
+import shutil
+import threading
+import time
+import hashlib
+import heapq
+import math
+import importlib
+import sqlite3
+import subprocess
+import multiprocessing
+import fnmatch
+import errno
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, as_completed, FIRST_COMPLETED
+
+
+NEW_NAME_PATTERN = re.compile(r'^[a-zA-Zа-яА-ЯёЁ0-9_\-\.\(\) ]+$')
+
+
+def is_valid_new_name(new_name, extension):
+    """Проверяет новое имя файла без учета совпадений с другими файлами"""
+    if not new_name.strip() or '?' in new_name:
+        return False
+    if not NEW_NAME_PATTERN.match(new_name):
+        return False
+    stem, new_extension = os.path.splitext(new_name)
+    if new_extension.lower() != extension:
+        return False
+    return bool(stem.strip()) and stem != '.'
+
+
+# тяжелые библиотеки импортируются при первом чтении книги или PDF, а не при запуске
+LAZY_MODULES = ('openpyxl', 'xlrd', 'pdf2image', 'pytesseract')
+
+
+def warm_up(logger=None):
+    """Заранее импортирует LAZY_MODULES (в окне - в фоновом потоке после показа,
+    в процессах пула - при их запуске), чтобы первый файл не ждал загрузки библиотек"""
+    started = time.monotonic()
+    for name in LAZY_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            if logger is not None:
+                logger.warning(f"Не удалось загрузить {name}: {str(e)}")
+    if logger is not None:
+        logger.debug(f"Библиотеки загружены за {time.monotonic() - started:.2f} с")
+
+
+class TagsManager:
+    REGEX_CHARS = ['[', '(', '*', '+', '?', '{', '}']
+    # глобальные флаги (?i), обратные ссылки и именованные группы ломают общее выражение
+    SEPARATE_REGEX = re.compile(r'\(\?[aiLmsux]+\)|\\[1-9]|\(\?P[<=]')
+    NAME_SEPARATORS = re.compile(r'[_\-. ]+')
+
+    def __init__(self, tags_data=None):
+        self.logger = logging.getLogger("PEDSorter")
+        self.exec_dir = Path(__file__).parent.absolute()
+        self.tags_file = self.exec_dir / 'file_types_base.json'
+        self.tags_data = self._load_tags() if tags_data is None else tags_data
+        self._build_matchers()
+
+    def snapshot(self):
+        """Независимая копия тэгов для фонового поиска: правка тэгов в окне
+        во время поиска не меняет матчеры, которыми пользуется поиск"""
+        return TagsManager(copy.deepcopy(self.tags_data))
+
+    def _load_tags(self):
+        """Загружает теги из файла или создает новый с дефолтными значениями"""
+        default_tags = {
+            "1": {
+                "type": "Локальная смета",
+                "name_tags": [
+                    "локальная смета",
+                    "лс",
+                    "лc"
+                ],
+                "internal_tags": [
+                    "локальная смета"
+                ],
+                "mask": "ЛС-ГС-ПНо-ПНл-ВЕРНН-КОММ"
+                },
+        }
+        try:
+            if not self.tags_file.exists():
+                os.makedirs(self.tags_file.parent, exist_ok=True)
+                self._save_tags(default_tags)
+                return default_tags
+            
+            with open(self.tags_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            self.logger.error(f"Ошибка загрузки тегов: {e}")
+            return default_tags
+
+    def _save_tags(self, data):
+        """Сохраняет теги в файл"""
+        with open(self.tags_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=4)
+
+    def get_type_data(self, type_id):
+        """Возвращает данные по типу файла"""
+        return self.tags_data.get(str(type_id))
+
+    def is_regex(self, tag):
+        """Тэг со спецсимволами считается регулярным выражением, остальные - обычным текстом"""
+        return any(c in tag for c in self.REGEX_CHARS)
+
+    def tag_error(self, tag):
+        """Текст ошибки, если тэг - неправильное регулярное выражение, иначе None"""
+        if not self.is_regex(tag):
+            return None
+        try:
+            re.compile(tag, re.IGNORECASE)
+        except re.error as e:
+            return str(e)
+        return None
+
+    def _compile_tag(self, tag):
+        """Возвращает (текст выражения, скомпилированное выражение, искать отдельно).
+        Неправильное регулярное выражение ищется как обычный текст, с записью в лог"""
+        if self.is_regex(tag):
+            error = self.tag_error(tag)
+            if error is None:
+                return tag, re.compile(tag, re.IGNORECASE), bool(self.SEPARATE_REGEX.search(tag))
+            self.logger.warning(f"Тэг {tag!r} - неправильное регулярное выражение ({error}), ищется как текст")
+        pattern = re.escape(tag.lower())
+        return pattern, re.compile(pattern, re.IGNORECASE), False
+
+    def split_name(self, name):
+        """Разбивает имя файла (или тэг) на слова в нижнем регистре"""
+        return [part for part in self.NAME_SEPARATORS.split(name.lower()) if part]
+
+    def _build_matchers(self):
+        self._build_name_index()
+        self._build_internal_matcher()
+
+    def _build_name_index(self):
+        """Строит индекс тэгов имени: слово -> id типов. Тэги из нескольких слов
+        ("локальная смета") хранятся как фразы по первому слову"""
+        self._name_index = {}
+        self._name_phrases = {}
+        for type_id, type_data in self.tags_data.items():
+            for tag in type_data.get("name_tags", []):
+                words = tuple(self.split_name(tag))
+                if len(words) == 1:
+                    self._name_index.setdefault(words[0], set()).add(type_id)
+                elif words:
+                    self._name_phrases.setdefault(words[0], []).append((words, type_id))
+
+    def find_name_tags(self, filename):
+        """Возвращает множество id типов, тэги которых есть в имени файла"""
+        words = self.split_name(filename)
+        found = set()
+        for i, word in enumerate(words):
+            found.update(self._name_index.get(word, ()))
+            for phrase, type_id in self._name_phrases.get(word, ()):
+                if tuple(words[i:i + len(phrase)]) == phrase:
+                    found.add(type_id)
+        return found
+
+    def _build_internal_matcher(self):
+        """Собирает внутренние тэги всех типов в одно регулярное выражение.
+        Каждому типу соответствует своя именованная группа, поэтому за один
+        проход по тексту видно, тэг какого типа найден. Тэги, которые нельзя
+        объединить с другими (SEPARATE_REGEX), ищутся каждый своим выражением"""
+        internal_groups = {}
+        internal_patterns = {}
+        separate_patterns = []
+        alternatives = []
+        for index, (type_id, type_data) in enumerate(self.tags_data.items()):
+            combined = []
+            for tag in type_data.get("internal_tags", []):
+                if not tag:
+                    continue
+                pattern, compiled, separate = self._compile_tag(tag)
+                internal_patterns.setdefault(type_id, []).append(compiled)
+                if separate:
+                    separate_patterns.append((type_id, compiled))
+                else:
+                    combined.append(pattern)
+            if combined:
+                group = f't{index}'
+                internal_groups[group] = type_id
+                alternatives.append(f"(?P<{group}>{'|'.join(f'(?:{p})' for p in combined)})")
+        internal_matcher = None
+        if alternatives:
+            try:
+                internal_matcher = re.compile(f"(?=(?:{'|'.join(alternatives)}))", re.IGNORECASE)
+            except re.error as e:
+                self.logger.error(f"Ошибка сборки внутренних тэгов: {e}")
+                separate_patterns = [(type_id, pattern) for type_id, patterns in internal_patterns.items()
+                                     for pattern in patterns]
+        self._internal_groups = internal_groups
+        self._internal_patterns = internal_patterns
+        self._separate_patterns = separate_patterns
+        self._internal_matcher = internal_matcher
+
+    def find_internal_tags(self, rows):
+        """Ищет внутренние тэги всех типов за один проход по строкам документа.
+        Возвращает словарь {id типа: номер первой строки с совпадением}"""
+        found = {}
+        if not rows:
+            return found
+        for row_index, row in enumerate(rows):
+            for type_id, pattern in self._separate_patterns:
+                if type_id not in found and pattern.search(row):
+                    found[type_id] = row_index
+            if self._internal_matcher is None:
+                continue
+            for match in self._internal_matcher.finditer(row):
+                type_id = self._internal_groups[match.lastgroup]
+                found.setdefault(type_id, row_index)
+                # в той же позиции может начинаться тэг другого типа
+                position = match.start()
+                for other_id, patterns in self._internal_patterns.items():
+                    if other_id not in found and any(pattern.match(row, position) for pattern in patterns):
+                        found[other_id] = row_index
+                if len(found) == len(self._internal_patterns):
+                    return found
+        return found
+
+    def add_tag(self, type_id, new_tag, tag_area):
+        """Добавляет новый тег для типа. Неправильное регулярное выражение
+        во внутренние тэги не добавляется (см. tag_error)"""
+        type_id = str(type_id)
+        if type_id not in self.tags_data:
+            return False
+        if tag_area == 'internal_tags' and self.tag_error(new_tag) is not None:
+            return False
+        if new_tag not in self.tags_data[type_id][tag_area]:
+            self.tags_data[type_id][tag_area].append(new_tag)
+            self._save_tags(self.tags_data)
+            self._build_matchers()
+            return True
+        return False
+
+    def remove_tag(self, type_id, tag_to_remove, tag_area):
+        """Удаляет тег у указанного типа"""
+        type_id = str(type_id)
+        if type_id in self.tags_data and tag_to_remove in self.tags_data[type_id][tag_area]:
+            self.tags_data[type_id][tag_area].remove(tag_to_remove)
+            self._save_tags(self.tags_data)
+            self._build_matchers()
+            return True
+        return False
+
+    def change_mask(self, type_id, new_mask):
+        type_id = str(type_id)
+        if type_id not in self.tags_data:
+            return False
+        self.tags_data[type_id]["mask"] = new_mask
+        self._save_tags(self.tags_data)
+        return True
+
+
+class DocumentCache:
+    """Кэш разобранных таблиц на время одного поиска.
+
+    Ключ - путь, размер и время изменения файла, значение - строки первого
+    видимого листа в нижнем регистре и сколько строк прочитано. Объем ограничен
+    суммарной длиной строк, при переполнении вытесняются давно не запрошенные файлы.
+    """
+    def __init__(self, reader, max_chars=20_000_000):
+        self._reader = reader
+        self.max_chars = max_chars
+        self._entries = OrderedDict()
+        self._chars = 0
+
+    @staticmethod
+    def _covers(rows, depth, max_rows):
+        """Прочитанного хватает: лист прочитан целиком, до нужной строки или оказался короче"""
+        return depth is None or (max_rows is not None and depth >= max_rows) or not rows or len(rows) < depth
+
+    def get_rows(self, filepath, max_rows=None):
+        """Возвращает список строк файла (не меньше первых max_rows, все, если None)
+        или None, если файл не прочитан. Файл перечитывается, только если раньше
+        его прочитали не так глубоко"""
+        try:
+            stat = os.stat(filepath)
+        except OSError:
+            return None
+        key = (str(filepath), stat.st_size, stat.st_mtime_ns)
+        entry = self._entries.get(key)
+        if entry is not None and self._covers(*entry, max_rows):
+            self._entries.move_to_end(key)
+            return entry[0]
+        rows = self._reader(filepath, max_rows)
+        self._put(key, rows, max_rows)
+        return rows
+
+    @staticmethod
+    def _size(rows):
+        return sum(len(row) for row in rows) if rows else 0
+
+    def _put(self, key, rows, depth):
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._chars -= self._size(previous[0])
+        size = self._size(rows)
+        if size > self.max_chars:
+            return
+        self._entries[key] = (rows, depth)
+        self._chars += size
+        while self._chars > self.max_chars:
+            _, (evicted, _) = self._entries.popitem(last=False)
+            self._chars -= self._size(evicted)
+
+    def clear(self):
+        self._entries.clear()
+        self._chars = 0
+
+
+class FileClassifier:
+    """Определяет тип файла и составляет для него новое имя.
+    Не обращается к окну, поэтому работает в фоновом потоке поиска."""
+    def __init__(self, tags_manager, logger, search_in_name=True, search_in_file=True,
+                 cache_chars=20_000_000, ocr_cache=None, tag_search_rows=None):
+        self.tags_manager = tags_manager
+        self.logger = logger
+        self.search_in_name = search_in_name
+        self.search_in_file = search_in_file
+        self.document_cache = DocumentCache(self._read_rows, cache_chars)
+        self.ocr_cache = ocr_cache
+        self._timings = None # время этапов текущего файла, пока идет detect
+        self._read_failed = False # файл не прочитан или не распознан - результат не кэшируется
+        self._nested = []
+
+        self.UNKNOWN = '?'
+        self.GENERIC_TYPES = ['Подтверждающие документы', 'Расчеты на прочие затраты']
+        self.CONTENT_EXTENSIONS = ['.xls', '.xlsx', '.pdf']  # в каких файлах искать внутренние тэги
+        self.MIN_TEXT_LAYER_LETTERS = 20  # меньше букв в текстовом слое PDF - распознаем OCR
+        self.OCR_HEADER_FRACTION = 0.35  # доля страницы сверху, где находится шапка документа
+        self.OCR_PASSES = [  # (DPI, доля страницы, способ) - от дешевого к дорогому
+            (150, self.OCR_HEADER_FRACTION, 'ocr_header'),
+            (300, 1.0, 'ocr'),
+        ]
+        self.NAME_ROWS = 20  # в скольких первых строках таблицы искать номер сметы
+        self.TAG_SEARCH_ROWS = tag_search_rows  # в скольких первых строках искать внутренние тэги, None - во всем листе
+        self.EX_NAME_LENGTH = 15
+        self.DEFAULT_VERSION = 'БАЗ'
+        self.DEFAULT_VERSION_NUMBER = ''
+        self.TYPES_7_AND_THEIR_CODENAMES = {
+            'Расчеты на прочие затраты': '?',
+            'Перевозка': "Перевозка",
+            'Командировочные расходы': "Командировочные",
+            'Перебазировка': 'Перебазировка',
+            'Затраты на охрану труда': 'ОхранаТруда',
+            'Затраты на проведение пусконаладочных работ (ПНР)': 'ПНР',
+            'Устройство дорог': 'УстройствоДорог',
+            'Дополнительные затраты при производстве работ в зимнее время (ЗУ)': 'ЗУ',
+            'Плата за негативное воздействие на окружающую среду (НВОС)': 'НВОС',
+            'Транспортировка': 'Транспортировка',
+            'Плавсредства': 'Плавсредства',
+            'Затраты на мониторинг компонентов окружающей среды (ПЭМ)': 'ПЭМ'
+        }
+        self.TYPES_8_AND_THEIR_CODENAMSE = {
+            'Подтверждающие документы': '?',
+            'Ведомость объемов работ': 'ВОР',
+            'Дефектная ведомость': 'ДВ',
+            'Коммерческое предложение': 'КП',
+            'Транспортная схема': 'ТС',
+            'Обоснование к расчету прочих затрат': 'ОбоснованиеПрочих',
+            'Конъюнктурный анализ': 'КА'
+        }
+        self.amount_of_documents_8_type = 0
+
+    def config_key(self):
+        """Хэш настроек, от которых зависит результат detect: тэги и режимы поиска"""
+        config = [self.tags_manager.tags_data, self.search_in_name, self.search_in_file, self.TAG_SEARCH_ROWS]
+        return hashlib.sha1(json.dumps(config, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def classify(self, filepath, filename):
+        """Возвращает тип, маску и новое имя файла"""
+        return self.number_document(filename, self.detect(filepath, filename))
+
+    def number_document(self, filename, data):
+        """Составляет имя подтверждающего документа. Имя содержит сквозной номер,
+        поэтому вызывается для файлов строго в порядке обхода директории"""
+        if data['type'] in self.TYPES_8_AND_THEIR_CODENAMSE.keys():
+            data['new_name'] = self.create_name_for_8_supporting_documents(filename, data['type'])
+        return data
+
+    def name_for_copy(self, data, filename, original_filename):
+        """Имя файла с тем же содержимым, что и уже обработанный файл original_filename:
+        тип и номер сметы берутся из data первого файла, а ссылка (ex. ...) и сквозной
+        номер подтверждающего документа - свои. Вызывается в порядке обхода, как number_document"""
+        if data['type'] in self.TYPES_8_AND_THEIR_CODENAMSE.keys():
+            return self.create_name_for_8_supporting_documents(filename, data['type'])
+        marker = f'(ex. {original_filename[:self.EX_NAME_LENGTH]}'
+        head, found, tail = data['new_name'].rpartition(marker)
+        if not found:
+            return data['new_name']
+        return f'{head}(ex. {filename[:self.EX_NAME_LENGTH]}{tail}'
+
+    def detect_by_name(self, filepath, filename):
+        """Предварительный результат только по тэгам в имени, без открытия файла.
+        Показывается в таблице, пока идет полный поиск"""
+        type_data = None
+        if self.search_in_name:
+            type_data, _ = self._resolve_type(self.tags_manager.find_name_tags(filename))
+        return {
+            'type': type_data["type"] if type_data else self.UNKNOWN,
+            'new_name': self.UNKNOWN,
+            'mask': type_data["mask"] if type_data else self.UNKNOWN,
+            'extension': filepath.suffix.lower(),
+            'filepath': filepath,
+            'pending': True
+            }
+
+    def failed(self, filepath):
+        """Результат для файла, на котором detect упал: файл остается в таблице
+        и выводе с неопределенным типом и не попадает в кэш"""
+        return {
+            'type': self.UNKNOWN,
+            'new_name': self.UNKNOWN,
+            'mask': self.UNKNOWN,
+            'extension': filepath.suffix.lower(),
+            'filepath': filepath,
+            'text_source': None,
+            'stages': [],
+            'stage': None,
+            'timings': {},
+            'read_failed': True
+            }
+
+    @contextmanager
+    def _stage(self, stage):
+        """Засекает время этапа (ScanReport.STAGES) для текущего файла.
+        Время вложенных этапов не входит во время внешнего"""
+        if self._timings is None:
+            yield
+            return
+        started = time.perf_counter()
+        self._nested.append(0.0)
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            own = elapsed - self._nested.pop()
+            self._timings[stage] = self._timings.get(stage, 0.0) + own
+            if self._nested:
+                self._nested[-1] += elapsed
+
+    def detect(self, filepath, filename):
+        """Определяет тип и маску файла и составляет новое имя, кроме имен
+        подтверждающих документов. Не зависит от других файлов, поэтому
+        может выполняться в дочернем процессе"""
+        self._timings = dict()
+        self._read_failed = False
+        try:
+            return self._detect(filepath, filename)
+        finally:
+            self._timings = None
+
+    def _detect(self, filepath, filename):
+        extension = filepath.suffix.lower()
+        type = self.UNKNOWN
+        new_name = self.UNKNOWN
+        mask = self.UNKNOWN
+
+        # выяснить, что за тип - от дешевых проверок к дорогим, следующий этап
+        # выполняется, только если тип еще не определен однозначно:
+        # 1) тэги в имени, 2) тэги в таблице или текстовом слое PDF, 3) OCR PDF
+        types_in_name = set()
+        types_in_file = {}
+        text_source = None
+        stages = []
+        stage = None
+        type_data, resolved = None, False
+        if self.search_in_name:
+            stages.append('name')
+            with self._stage('tags'):
+                types_in_name = self.tags_manager.find_name_tags(filename)
+            type_data, resolved = self._resolve_type(types_in_name)
+            if resolved:
+                stage = 'name'
+        if self.search_in_file and not resolved and extension in self.CONTENT_EXTENSIONS:
+            stages.append('content')
+            types_in_file, text_source = self.check_if_tags_in_file(filepath)
+            type_data, resolved = self._resolve_type(types_in_name, types_in_file)
+            if resolved:
+                stage = 'content'
+            elif extension == '.pdf' and text_source is None:
+                stages.append('ocr')
+                types_in_file, text_source = self.check_tags_in_pdf_ocr(filepath)
+                type_data, resolved = self._resolve_type(types_in_name, types_in_file)
+                if resolved:
+                    stage = 'ocr'
+        if type_data is not None:
+            type = type_data["type"]
+            mask = type_data["mask"]
+
+        # создание имен:
+        with self._stage('naming'):
+            if type == 'Локальная смета':
+                new_name = self.create_name_for_1_local_estimate(filepath, filename)
+            if type == 'Объектная смета':
+                new_name = self.create_name_for_2_object_estimate(filepath, filename)
+            if type == 'Сводный сметный расчет':
+                new_name = self.create_name_for_3_summary_estimate(filepath, filename)
+            if type == 'Сводный реестр сметной документации':
+                new_name = self.create_name_for_4_register_of_estimates(filepath, filename)
+            if type == 'Сметные расчеты на отдельные виды затрат':
+                new_name = self.create_name_for_5_specific_types_of_costs(filepath, filename)
+            if type == 'Сравнительная таблица изменения стоимости МТР по договору подряда (Форма 1.3)':
+                new_name = self.create_name_for_6_MTR_cost_change_table(filepath, filename)
+            if type in self.TYPES_7_AND_THEIR_CODENAMES.keys():
+                new_name = self.create_name_for_7_other_expenses(filename, type)
+
+        return {
+            'type': type,
+            'new_name': new_name,
+            'mask': mask,
+            'extension': extension,
+            'filepath': filepath,
+            'text_source': text_source,
+            'stages': stages,
+            'stage': stage,
+            'timings': self._timings,
+            'read_failed': self._read_failed
+            }
+
+    def _resolve_type(self, *found):
+        """Выбирает тип среди найденных в порядке базы тэгов: первый конкретный,
+        а если нашлись только общие (GENERIC_TYPES) - последний из них.
+        Второе значение - однозначен ли выбор: найден ровно один конкретный тип"""
+        result = None
+        specific = 0
+        for type_id, type_data in self.tags_manager.tags_data.items():
+            if not any(type_id in types for types in found):
+                continue
+            if type_data["type"] in self.GENERIC_TYPES:
+                if not specific:
+                    result = type_data
+            else:
+                specific += 1
+                if specific == 1:
+                    result = type_data
+        return result, specific == 1
+
+    def extract_text_from_pdf_first_page(self, pdf_path, lang='rus+eng', dpi=300, fraction=1.0):
+        """
+        Извлекает текст с первой страницы PDF используя OCR.
+        fraction - какая доля страницы сверху распознается.
+        Распознанный текст берется из кэша, если такой же файл уже распознавали
+        """
+        if self.ocr_cache is None:
+            return self._ocr_first_page(pdf_path, lang, dpi, fraction)
+        return self.ocr_cache.get_text(pdf_path, f'first_page:{lang}:{dpi}:{fraction}:gray',
+                                       lambda: self._ocr_first_page(pdf_path, lang, dpi, fraction))
+
+    def _ocr_first_page(self, pdf_path, lang, dpi=300, fraction=1.0):
+        import pytesseract
+        from pdf2image import convert_from_path
+        try:
+            with self._stage('ocr_render'):
+                images = convert_from_path(pdf_path, first_page=1, last_page=1, dpi=dpi, grayscale=True)
+            if not images:
+                return ""
+
+            image = images[0]
+            if fraction < 1:
+                image = image.crop((0, 0, image.width, int(image.height * fraction)))
+
+            # страница передается в Tesseract сразу, без сохранения во временный JPEG
+            with self._stage('ocr_recognize'):
+                text = pytesseract.image_to_string(self.prepare_image_for_ocr(image), lang=lang)
+            return text.lower()
+            
+        except Exception as e:
+            self._read_failed = True
+            self.logger.error(f"Ошибка OCR обработки {pdf_path}: {str(e)}")
+            return ""
+
+    def prepare_image_for_ocr(self, image):
+        """Передает страницу в оттенках серого: бинаризацию Tesseract делает сам
+        (адаптивно, по Оцу), фиксированный порог терял бледные и цветные сканы"""
+        return image.convert('L')
+
+    def extract_text_layer(self, pdf_path):
+        """
+        Извлекает текстовый слой первой страницы PDF утилитой pdftotext
+        (входит в poppler, который нужен pdf2image). Пустая строка, если слоя нет
+        """
+        try:
+            result = subprocess.run(
+                ['pdftotext', '-f', '1', '-l', '1', '-enc', 'UTF-8', str(pdf_path), '-'],
+                capture_output=True, timeout=60,
+                creationflags=getattr(subprocess, 'CREATE_NO_WINDOW', 0))
+        except (OSError, subprocess.SubprocessError):
+            self._read_failed = True
+            return ""
+        if result.returncode != 0:
+            self._read_failed = True
+            return ""
+        return result.stdout.decode('utf-8', errors='ignore').lower()
+
+    def check_tags_in_pdf(self, pdf_path):
+        """
+        Проверяет наличие тегов в текстовом слое PDF файла. Если слоя нет
+        или он слишком короткий, возвращает ({}, None) - нужен OCR
+        """
+        with self._stage('text_layer'):
+            pdf_text = self.extract_text_layer(pdf_path)
+        if sum(c.isalpha() for c in pdf_text) >= self.MIN_TEXT_LAYER_LETTERS:
+            with self._stage('tags'):
+                return self.tags_manager.find_internal_tags([pdf_text]), 'layer'
+        return {}, None
+
+    def check_tags_in_pdf_ocr(self, pdf_path):
+        """
+        Проверяет наличие тегов в PDF файле через OCR. Распознает, начиная с шапки
+        в низком разрешении, и переходит к следующему проходу, только если тэги
+        не найдены. Второе значение: 'ocr_header' - хватило шапки, 'ocr' - вся страница.
+        Если ни один проход не дал текста, файл считается нераспознанным и не кэшируется
+        """
+        recognized = False
+        for dpi, fraction, text_source in self.OCR_PASSES:
+            pdf_text = self.extract_text_from_pdf_first_page(pdf_path, dpi=dpi, fraction=fraction)
+            if pdf_text.strip():
+                recognized = True
+                with self._stage('tags'):
+                    found = self.tags_manager.find_internal_tags([pdf_text])
+                if found:
+                    return found, text_source
+        if not recognized:
+            self._read_failed = True
+        return {}, 'ocr'
+
+    def check_if_tags_in_file(self, filepath):
+        """Ищет внутренние тэги всех типов в таблице или текстовом слое PDF.
+        Возвращает словарь {id типа: номер строки, где найден тэг} и способ
+        получения текста PDF ('layer'; None - у PDF нет текстового слоя и для таблиц)"""
+        
+        # Для PDF файлов - текстовый слой
+        if str(filepath).lower().endswith('.pdf'):
+            return self.check_tags_in_pdf(filepath)
+        
+        # Для Excel файлов - обычная обработка
+        rows = self.document_cache.get_rows(filepath, self.TAG_SEARCH_ROWS)
+        if rows and self.TAG_SEARCH_ROWS is not None:
+            rows = rows[:self.TAG_SEARCH_ROWS]
+        with self._stage('tags'):
+            return self.tags_manager.find_internal_tags(rows), None
+
+    def _read_rows(self, filepath, max_rows):
+        """Читает первые max_rows строк таблицы: NAME_ROWS для имени,
+        TAG_SEARCH_ROWS (весь лист, если None) для поиска тэгов"""
+        with self._stage('read'):
+            if max_rows is not None:
+                max_rows = max(max_rows, self.NAME_ROWS)
+            return self.read_xls_xlsx_file(filepath, max_rows)
+
+    @staticmethod
+    def _row_to_text(values):
+        """Склеивает значения ячеек строки в текст в нижнем регистре"""
+        parts = []
+        for value in values:
+            if value is None or value == '' or (isinstance(value, float) and value != value):
+                continue
+            if isinstance(value, float) and value.is_integer():
+                value = int(value)
+            parts.append(str(value).lower())
+        return ''.join(parts)
+
+    def read_xls_xlsx_file(self, filepath, max_rows=None):
+        """Возвращает первые max_rows строк видимого листа (все, если None) в виде текста"""
+        if os.path.basename(filepath).startswith('~$'):
+            return None
+        if not os.path.exists(filepath):
+            self.logger.error(f'Файл не существует: {filepath}')
+            self._read_failed = True
+            return None
+        try:
+            if str(filepath).lower().endswith('.xlsx'):
+                return self._read_xlsx_visible_sheet(filepath, max_rows)
+            elif str(filepath).lower().endswith('.xls'):
+                return self._read_xls_visible_sheet(filepath, max_rows)
+            else:
+                return None
+        except Exception as e:
+            self.logger.error(f"Ошибка чтения файла {filepath}: {str(e)}")
+            self._read_failed = True
+            return None
+
+    def _read_xlsx_visible_sheet(self, filepath, max_rows=None):
+        """Чтение первого видимого листа для xlsx с проверкой sheet_state.
+        Книга открывается один раз и закрывается после чтения, строки читаются
+        потоково, в память попадают только первые max_rows"""
+        from openpyxl import load_workbook
+        wb = load_workbook(filepath, read_only=True, data_only=True)
+        try:
+            sheet = next((ws for ws in wb.worksheets if ws.sheet_state == 'visible'), None)
+            if sheet is None:
+                self.logger.warning(f"Не найдено видимых листов в {filepath}")
+                return None
+            rows = sheet.iter_rows(max_row=max_rows, values_only=True)
+            return [self._row_to_text(row) for row in rows] or None
+        finally:
+            wb.close()
+
+    def _read_xls_visible_sheet(self, filepath, max_rows=None):
+        """Чтение первого видимого непустого листа для xls. Видимость берется
+        из книги (visibility), листы загружаются по одному, файл закрывается после чтения"""
+        import xlrd
+        book = xlrd.open_workbook(filepath, on_demand=True)
+        try:
+            for index in range(book.nsheets):
+                sheet = book.sheet_by_index(index)
+                if sheet.visibility == 0 and sheet.nrows:
+                    nrows = sheet.nrows if max_rows is None else min(sheet.nrows, max_rows)
+                    return [self._row_to_text(self._xls_cell_value(cell, book.datemode) for cell in sheet.row(i))
+                            for i in range(nrows)]
+                book.unload_sheet(index)
+            self.logger.warning(f"Не найдено видимых листов в {filepath}")
+            return None
+        finally:
+            book.release_resources()
+
+    @staticmethod
+    def _xls_cell_value(cell, datemode):
+        """Значение ячейки xls: даты - datetime, пустые и ошибочные ячейки - None"""
+        import xlrd
+        if cell.ctype in (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK, xlrd.XL_CELL_ERROR):
+            return None
+        if cell.ctype == xlrd.XL_CELL_DATE:
+            try:
+                return xlrd.xldate_as_datetime(cell.value, datemode)
+            except (ValueError, OverflowError, xlrd.XLDateError):
+                return cell.value
+        if cell.ctype == xlrd.XL_CELL_BOOLEAN:
+            return bool(cell.value)
+        return cell.value
+
+    def create_name_for_1_local_estimate(self, filepath, filename):
+        """Создает новое имя для локальной сметы: """
+        TARGET_TEXT = ['локальн', 'смета', 'сметный']
+        ESTIMATE_NUMBER_UNKNOWN = '??-??-??'
+        estimate_number = ESTIMATE_NUMBER_UNKNOWN
+        version = self.DEFAULT_VERSION
+        version_number = self.DEFAULT_VERSION_NUMBER
+        const = 'ЛС'
+        rows = self.document_cache.get_rows(filepath, self.NAME_ROWS)
+        lines_to_chek = self.NAME_ROWS #в скольких первых строках искать совпадения
+        if rows:
+            for row_data in rows[:lines_to_chek]:
+                for tag in list(map(lambda x: x.lower(), TARGET_TEXT)):
+                    if tag in row_data:
+                        if '№' in row_data:
+                            number = row_data.split('№')[-1].strip()
+                            if re.search(r'^\d{1,2}-\d{1,2}(?:-\d{1,2})?$', number):
+                                estimate_number = number
+                                break
+        return f'{const}-{estimate_number}-{version}{version_number}-(ex. {filename[:self.EX_NAME_LENGTH]}..)'
+
+    def create_name_for_2_object_estimate(self, filepath, filename):
+        """Создает новое имя для объектной сметы: """
+        TARGET_TEXT = ['объектн', 'смета', 'сметный']
+        ESTIMATE_NUMBER_UNKNOWN = '??-??'
+        estimate_number = ESTIMATE_NUMBER_UNKNOWN
+        DEFAULT_VERSION = 'БАЗ'
+        version = DEFAULT_VERSION
+        version_number = self.DEFAULT_VERSION_NUMBER
+        const = 'ОС'
+        rows = self.document_cache.get_rows(filepath, self.NAME_ROWS)
+        lines_to_chek = self.NAME_ROWS #в скольких первых строках искать совпадения
+        if rows:
+            for row_data in rows[:lines_to_chek]:
+                for tag in list(map(lambda x: x.lower(), TARGET_TEXT)):
+                    if tag in row_data:
+                        if '№' in row_data:
+                            number = row_data.split('№')[-1].strip()
+                            if re.search(r'^\d{1,2}(?:-\d{1,2})?$', number):
+                                estimate_number = number
+                                break
+        return f'{const}-{estimate_number}-{version}{version_number}-(ex. {filename[:self.EX_NAME_LENGTH]}..)'
+
+    def create_name_for_3_summary_estimate(self, filepath, filename):
+        """Создает новое имя для сводного сметного расчета: """
+        TARGET_TEXT = ['сводн', 'смета', 'сметный']
+        ESTIMATE_NUMBER_UNKNOWN = '??'
+        estimate_number = ESTIMATE_NUMBER_UNKNOWN
+        version = self.DEFAULT_VERSION
+        version_number = self.DEFAULT_VERSION_NUMBER
+        const = 'ССР'
+        rows = self.document_cache.get_rows(filepath, self.NAME_ROWS)
+        lines_to_chek = self.NAME_ROWS #в скольких первых строках искать совпадения
+        if rows:
+            for row_data in rows[:lines_to_chek]:
+                for tag in list(map(lambda x: x.lower(), TARGET_TEXT)):
+                    if tag in row_data:
+                        if '№' in row_data:
+                            number = row_data.split('№')[-1].strip()
+                            if re.search(r'^\d{1,2}$', number):
+                                estimate_number = number
+                                break
+        return f'{const}-{estimate_number}-{version}{version_number}-(ex. {filename[:self.EX_NAME_LENGTH]}..)'
+
+    def create_name_for_4_register_of_estimates(self, filepath, filename):
+        version = self.DEFAULT_VERSION
+        const = 'СРСД'
+        version_number = self.DEFAULT_VERSION_NUMBER
+        return f'{const}-{version}{version_number}-(ex. {filename[:self.EX_NAME_LENGTH]}..)'
+
+    def create_name_for_5_specific_types_of_costs(self, filepath, filename):
+        version = self.DEFAULT_VERSION
+        const = 'СРОВЗ'
+        version_number = self.DEFAULT_VERSION_NUMBER
+        return f'{const}-{version}{version_number}-(ex. {filename[:self.EX_NAME_LENGTH]}..)'
+    
+    def create_name_for_6_MTR_cost_change_table(self, filepath, filename):
+        version = self.DEFAULT_VERSION
+        const = 'ФОРМА1.3'
+        version_number = self.DEFAULT_VERSION_NUMBER
+        return f'{const}-{version}{version_number}-(ex. {filename[:self.EX_NAME_LENGTH]}..)'
+    
+    def create_name_for_7_other_expenses(self, filename, type):
+        version = self.DEFAULT_VERSION
+        const = 'ПРОЧ'
+        version_number = self.DEFAULT_VERSION_NUMBER
+        type_of_calculation = self.TYPES_7_AND_THEIR_CODENAMES[type]
+        return f'{const}-{type_of_calculation}-{version}{version_number}-(ex. {filename[:self.EX_NAME_LENGTH]}...)'
+
+    def create_name_for_8_supporting_documents(self, filename, type):
+        version = self.DEFAULT_VERSION
+        const = 'ПОДТВ'
+        version_number = self.DEFAULT_VERSION_NUMBER
+        type_of_document = self.TYPES_8_AND_THEIR_CODENAMSE[type]
+        self.amount_of_documents_8_type += 1
+        if type_of_document == 'Обоснование к расчету прочих затрат':
+            return f'{const}-{type_of_document}-ТИППРОЧ-{self.amount_of_documents_8_type}-{version}{version_number}-(ex. {filename[:self.EX_NAME_LENGTH]}...)'
+        else:
+            return f'{const}-{type_of_document}-{self.amount_of_documents_8_type}-{version}{version_number}-(ex. {filename[:self.EX_NAME_LENGTH]}...)'
+
+
+class ScanRecord:
+    """Результат поиска по одному файлу. path - путь относительно выбранной директории"""
+    __slots__ = ('path', 'type', 'mask', 'new_name', 'extension', 'text_source',
+                 'stage', 'stages', 'pending', 'edited_name', 'duplicate_of')
+
+    def __init__(self, path):
+        self.path = path
+        self.edited_name = None
+
+    @property
+    def filename(self):
+        return os.path.basename(self.path)
+
+    @property
+    def final_name(self):
+        """Новое имя с расширением, с учетом ручной правки"""
+        if self.edited_name is not None:
+            return self.edited_name
+        return self.new_name + self.extension
+
+
+class ScanResults:
+    """Результаты поиска по всем файлам директории с ключом по относительному пути.
+    Одинаковые имена в разных подпапках не перезаписывают друг друга.
+
+    Поиск записей по пути, по группе тёзок (папка, имя без расширения) и по типу"""
+
+    SHARE_SOURCE_EXTENSIONS = ['.xlsx', '.xls'] # по порядку старшинства
+    SHARE_TARGET_EXTENSIONS = ['.pdf', '.gsfx', '.gs']
+
+    def __init__(self, root=''):
+        self.root = str(root)
+        self._records = dict()
+        self._by_stem = dict()
+        self._by_type = dict()
+
+    def __len__(self):
+        return len(self._records)
+
+    def __iter__(self):
+        return iter(self._records.values())
+
+    def __contains__(self, path):
+        return path in self._records
+
+    def relative(self, filepath):
+        return os.path.relpath(str(filepath), self.root)
+
+    def full_path(self, record):
+        return os.path.join(self.root, record.path)
+
+    def get(self, path):
+        return self._records.get(path)
+
+    def put(self, data, replace=True):
+        """Сохраняет результат detect/detect_by_name. Если файл уже есть, запись
+        обновляется на месте (ручная правка имени сохраняется), а при replace=False
+        остается как есть"""
+        path = self.relative(data['filepath'])
+        record = self._records.get(path)
+        if record is None:
+            record = ScanRecord(path)
+            record.type = None
+            self._records[path] = record
+            directory, name = os.path.split(path)
+            self._by_stem.setdefault((directory, os.path.splitext(name)[0]), []).append(record)
+        elif not replace:
+            return record
+        self.assign(record, data['type'], data['mask'], data['new_name'])
+        record.extension = sys.intern(data['extension'])
+        record.text_source = data.get('text_source')
+        record.stage = data.get('stage')
+        record.stages = tuple(data.get('stages', ()))
+        record.pending = bool(data.get('pending'))
+        record.duplicate_of = self.relative(data['duplicate_of']) if data.get('duplicate_of') else None
+        return record
+
+    def assign(self, record, type, mask, new_name):
+        """Меняет тип, маску и новое имя записи и индекс по типам"""
+        if record.type != type:
+            if record.type is not None:
+                self._by_type[record.type].pop(record.path, None)
+            self._by_type.setdefault(type, dict())[record.path] = record
+        record.type = sys.intern(type)
+        record.mask = sys.intern(mask)
+        record.new_name = new_name
+
+    def stem_group(self, record):
+        """Файлы той же папки с тем же именем без расширения, включая сам record"""
+        directory, name = os.path.split(record.path)
+        return self._by_stem[(directory, os.path.splitext(name)[0])]
+
+    def stem_groups(self):
+        return self._by_stem.values()
+
+    def by_type(self, type):
+        return list(self._by_type.get(type, dict()).values())
+
+    def share_xls_info(self):
+        """Если в одной папке находятся файлы одинакового имени, но разного расширения,
+        передает инфу о типе и новом имени от xls файла тёскам .pdf/.gsfx/.gs.
+        Если рядом лежат и .xlsx, и .xls, инфу берем из .xlsx"""
+        for group in self.stem_groups():
+            if len(group) < 2:
+                continue
+            sources = dict()
+            for record in group:
+                if not record.pending:
+                    sources.setdefault(record.extension, record)
+            source = next((sources[ext] for ext in self.SHARE_SOURCE_EXTENSIONS if ext in sources), None)
+            if source is None:
+                continue
+            for record in group:
+                if record.extension in self.SHARE_TARGET_EXTENSIONS and not record.pending:
+                    self.assign(record, source.type, source.mask, source.new_name)
+
+    def ready_for_copy(self):
+        """Записи, которые окно по умолчанию отмечает для копирования: тип и имя
+        определены полностью, имя допустимо и не совпадает с именами других файлов.
+        Копии других файлов пропускаются, пока их имя не исправили вручную"""
+        candidates = [record for record in self if not record.pending
+                      and (not record.duplicate_of or record.edited_name is not None)]
+        names = Counter(record.final_name for record in candidates)
+        ready = []
+        for record in candidates:
+            if record.edited_name is None and (record.type == '?' or '?' in record.new_name):
+                continue
+            if names[record.final_name] == 1 and is_valid_new_name(record.final_name, record.extension):
+                ready.append(record)
+        return ready
+
+    def to_dict(self, record, ready=False):
+        """Запись для выгрузки в JSON/CSV"""
+        return {
+            'path': record.path,
+            'type': record.type,
+            'mask': record.mask,
+            'new_name': record.final_name,
+            'text_source': record.text_source,
+            'stage': record.stage,
+            'duplicate_of': record.duplicate_of,
+            'ready': ready,
+        }
+
+
+class ScanReport:
+    """Время этапов поиска: итог, число файлов, p50/p95/max по каждому этапу и
+    TOP_FILES самых долгих файлов. Копятся только длительности из time.perf_counter,
+    без записи в лог по каждому файлу, поэтому отчет собирается при каждом поиске"""
+    STAGES = {
+        'enumerate': 'Обход директории',
+        'read': 'Чтение книги',
+        'tags': 'Поиск тэгов',
+        'text_layer': 'Текстовый слой PDF',
+        'ocr_render': 'OCR: растр страницы',
+        'ocr_recognize': 'OCR: распознавание',
+        'naming': 'Составление имени',
+        'table': 'Заполнение таблицы',
+    }
+    TOP_FILES = 10
+
+    def __init__(self, root=''):
+        self.root = str(root)
+        self.started = datetime.now()
+        self.wall = 0.0 # секунд от начала до конца поиска
+        self.files = 0
+        self.cached = 0
+        self.duplicates = 0
+        self._durations = {stage: [] for stage in self.STAGES}
+        self._slowest = [] # куча (секунд на файл, номер файла, путь, этапы)
+
+    def add(self, stage, seconds):
+        self._durations[stage].append(seconds)
+
+    def add_file(self, filepath, timings):
+        """Этапы одного обработанного файла. timings = None - результат взят из кэша"""
+        self.files += 1
+        if timings is None:
+            self.cached += 1
+            return
+        for stage, seconds in timings.items():
+            self._durations[stage].append(seconds)
+        entry = (sum(timings.values()), self.files, filepath, timings)
+        if len(self._slowest) < self.TOP_FILES:
+            heapq.heappush(self._slowest, entry)
+        else:
+            heapq.heappushpop(self._slowest, entry)
+
+    @staticmethod
+    def _percentile(values, percent):
+        return values[max(0, math.ceil(len(values) * percent / 100) - 1)]
+
+    def stages(self):
+        """Сводка по этапам, которые выполнялись хотя бы раз"""
+        summary = []
+        for stage, title in self.STAGES.items():
+            values = sorted(self._durations[stage])
+            if not values:
+                continue
+            summary.append({
+                'stage': stage,
+                'title': title,
+                'count': len(values),
+                'total': sum(values),
+                'p50': self._percentile(values, 50),
+                'p95': self._percentile(values, 95),
+                'max': values[-1],
+            })
+        return summary
+
+    def slowest(self):
+        return [{'path': os.path.relpath(str(filepath), self.root), 'total': total, 'stages': timings}
+                for total, _, filepath, timings in sorted(self._slowest, reverse=True)]
+
+    def to_dict(self):
+        return {
+            'directory': self.root,
+            'started': self.started.isoformat(timespec='seconds'),
+            'wall': self.wall,
+            'files': self.files,
+            'cached': self.cached,
+            'duplicates': self.duplicates,
+            'stages': self.stages(),
+            'slowest': self.slowest(),
+        }
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=4)
+
+    def format(self):
+        """Отчет текстом, для окна отчета"""
+        lines = [
+            f"Папка: {self.root}",
+            f"Начало: {self.started:%d.%m.%Y %H:%M:%S}, длительность {self.wall:.1f} с",
+            f"Файлов: {self.files}, из кэша {self.cached}, копий других файлов {self.duplicates}",
+            "",
+            f"{'Этап':<24}{'раз':>8}{'всего, с':>12}{'p50, мс':>10}{'p95, мс':>10}{'max, мс':>10}",
+        ]
+        for row in self.stages():
+            lines.append(f"{row['title']:<24}{row['count']:>8}{row['total']:>12.2f}{row['p50'] * 1000:>10.0f}"
+                         f"{row['p95'] * 1000:>10.0f}{row['max'] * 1000:>10.0f}")
+        slowest = self.slowest()
+        if slowest:
+            lines += ["", "Самые долгие файлы:"]
+            for entry in slowest:
+                stages = ', '.join(f"{self.STAGES[stage]} {seconds:.2f}"
+                                   for stage, seconds in sorted(entry['stages'].items(), key=lambda x: -x[1]))
+                lines.append(f"{entry['total']:8.2f} с  {entry['path']}  ({stages})")
+        return '\n'.join(lines)
+
+
+class ScanCache:
+    """Результаты detect между запусками программы (SQLite рядом с базой тэгов).
+
+    Запись действительна, пока у файла не изменились размер и время изменения,
+    а у программы - тэги и режимы поиска (config_key). Соединение открывается
+    в том потоке, где идет поиск.
+    """
+    VERSION = 7  # увеличить, если меняется логика detect
+
+    def __init__(self, db_path, config_key, max_entries=200_000, logger=None):
+        self.db_path = str(db_path)
+        self.config_key = f'{self.VERSION}:{config_key}'
+        self.max_entries = max_entries
+        self.logger = logger
+        self._connection = None
+
+    def _disable(self, error):
+        """База недоступна (папка только для чтения, файл занят другим запуском
+        или испорчен) - до конца поиска кэш не используется"""
+        if self.logger is not None:
+            self.logger.warning(f"Кэш результатов {self.db_path} недоступен, поиск без кэша: {str(error)}")
+        connection, self._connection = self._connection, None
+        if connection is not None:
+            try:
+                connection.close()
+            except sqlite3.Error:
+                pass
+
+    def open(self):
+        try:
+            self._connection = sqlite3.connect(self.db_path, timeout=30)
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS files ('
+                'path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, config TEXT, '
+                'result TEXT, last_used REAL)')
+            self._connection.execute('CREATE INDEX IF NOT EXISTS files_last_used ON files (last_used)')
+        except sqlite3.Error as e:
+            self._disable(e)
+
+    def close(self):
+        if self._connection is not None:
+            try:
+                self._connection.commit()
+                self._connection.close()
+            except sqlite3.Error as e:
+                self._disable(e)
+            self._connection = None
+
+    def get(self, filepath, stat):
+        """Возвращает сохраненный результат или None, если файл нужно обработать заново"""
+        if self._connection is None:
+            return None
+        try:
+            row = self._connection.execute(
+                'SELECT size, mtime_ns, config, result FROM files WHERE path = ?',
+                (str(filepath),)).fetchone()
+            if row is None or tuple(row[:3]) != (stat.st_size, stat.st_mtime_ns, self.config_key):
+                return None
+            self._connection.execute('UPDATE files SET last_used = ? WHERE path = ?', (time.time(), str(filepath)))
+            data = json.loads(row[3])
+        except (sqlite3.Error, ValueError) as e:
+            self._disable(e)
+            return None
+        data['filepath'] = Path(filepath)
+        return data
+
+    def put(self, filepath, stat, data):
+        if self._connection is None:
+            return
+        result = {key: value for key, value in data.items() if key not in ('filepath', 'timings', 'read_failed')}
+        try:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)',
+                (str(filepath), stat.st_size, stat.st_mtime_ns, self.config_key,
+                 json.dumps(result, ensure_ascii=False), time.time()))
+        except sqlite3.Error as e:
+            self._disable(e)
+
+    def commit(self):
+        if self._connection is None:
+            return
+        try:
+            self._connection.commit()
+        except sqlite3.Error as e:
+            self._disable(e)
+
+    def prune(self, root, seen_paths):
+        """Удаляет записи файлов, которых больше нет в директории root,
+        и самые давно использованные записи сверх max_entries"""
+        if self._connection is None:
+            return
+        prefix = os.path.join(str(root), '')
+        try:
+            stored = self._connection.execute(
+                'SELECT path FROM files WHERE path >= ? AND path < ?', (prefix, prefix + '\uffff'))
+            missing = [(path,) for (path,) in stored.fetchall() if path not in seen_paths]
+            self._connection.executemany('DELETE FROM files WHERE path = ?', missing)
+            self._connection.execute(
+                'DELETE FROM files WHERE path IN ('
+                'SELECT path FROM files ORDER BY last_used DESC LIMIT -1 OFFSET ?)', (self.max_entries,))
+            self._connection.commit()
+        except sqlite3.Error as e:
+            self._disable(e)
+
+
+class OcrCache:
+    """Кэш распознанного текста PDF по хэшу содержимого файла, поэтому
+    копии одного скана в разных папках распознаются один раз.
+
+    В памяти хранится текст, распознанный за текущий поиск, на диске (SQLite) -
+    за все время, не больше max_bytes; при переполнении удаляются записи,
+    которые дольше всего не запрашивались.
+    """
+    HASHES = 1024 # сколько хэшей файлов помнить
+
+    def __init__(self, db_path=None, max_bytes=200 * 1024 * 1024, memory_chars=5_000_000):
+        self.db_path = str(db_path) if db_path else None
+        self.max_bytes = max_bytes
+        self.memory_chars = memory_chars
+        self._hashes = OrderedDict()
+        self._memory = OrderedDict()
+        self._chars = 0
+        self._connection = None
+        self._stored_bytes = 0
+
+    @staticmethod
+    def file_hash(filepath):
+        digest = hashlib.sha1()
+        with open(filepath, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def cached_file_hash(self, filepath):
+        """Хэш файла, запомненный по пути, размеру и времени изменения: проходы OCR
+        одного PDF с разными параметрами читают файл для хэша один раз"""
+        stat = os.stat(filepath)
+        key = (str(filepath), stat.st_size, stat.st_mtime_ns)
+        digest = self._hashes.get(key)
+        if digest is None:
+            digest = self._hashes[key] = self.file_hash(filepath)
+            if len(self._hashes) > self.HASHES:
+                self._hashes.popitem(last=False)
+        return digest
+
+    def get_text(self, filepath, variant, recognize):
+        """Возвращает текст из кэша или распознает его функцией recognize.
+        variant - параметры распознавания (страница, язык, DPI)"""
+        try:
+            key = f'{self.cached_file_hash(filepath)}:{variant}'
+        except OSError:
+            return recognize()
+        text = self._memory_get(key)
+        if text is None:
+            text = self._db_get(key)
+            if text is None:
+                text = recognize()
+                if not text:  # пустой текст может означать ошибку распознавания
+                    return text
+                self._db_put(key, text)
+            self._memory_put(key, text)
+        return text
+
+    def _memory_get(self, key):
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            return self._memory[key]
+        return None
+
+    def _memory_put(self, key, text):
+        self._memory[key] = text
+        self._chars += len(text)
+        while self._chars > self.memory_chars and len(self._memory) > 1:
+            _, evicted = self._memory.popitem(last=False)
+            self._chars -= len(evicted)
+
+    def _open(self):
+        if self._connection is None and self.db_path:
+            try:
+                self._connection = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+                self._connection.execute(
+                    'CREATE TABLE IF NOT EXISTS ocr (key TEXT PRIMARY KEY, text TEXT, size INTEGER, last_used REAL)')
+                self._connection.execute('CREATE INDEX IF NOT EXISTS ocr_last_used ON ocr (last_used)')
+                self._stored_bytes = self._connection.execute('SELECT COALESCE(SUM(size), 0) FROM ocr').fetchone()[0]
+            except sqlite3.Error:
+                self._connection = None
+                self.db_path = None
+        return self._connection
+
+    def _db_get(self, key):
+        connection = self._open()
+        if connection is None:
+            return None
+        try:
+            row = connection.execute('SELECT text FROM ocr WHERE key = ?', (key,)).fetchone()
+            if row is not None:
+                connection.execute('UPDATE ocr SET last_used = ? WHERE key = ?', (time.time(), key))
+                connection.commit()
+                return row[0]
+        except sqlite3.Error:
+            pass
+        return None
+
+    def _db_put(self, key, text):
+        connection = self._open()
+        if connection is None:
+            return
+        size = len(text.encode('utf-8'))
+        try:
+            connection.execute('INSERT OR REPLACE INTO ocr VALUES (?, ?, ?, ?)', (key, text, size, time.time()))
+            self._stored_bytes += size
+            if self._stored_bytes > self.max_bytes:
+                self._evict(connection)
+            connection.commit()
+        except sqlite3.Error:
+            pass
+
+    def _evict(self, connection):
+        """Удаляет давно не использованные записи, пока кэш не станет меньше max_bytes"""
+        self._stored_bytes = connection.execute('SELECT COALESCE(SUM(size), 0) FROM ocr').fetchone()[0]
+        oldest = connection.execute('SELECT key, size FROM ocr ORDER BY last_used')
+        to_delete = []
+        for key, size in oldest:
+            if self._stored_bytes <= self.max_bytes:
+                break
+            to_delete.append((key,))
+            self._stored_bytes -= size
+        connection.executemany('DELETE FROM ocr WHERE key = ?', to_delete)
+
+    def close(self):
+        self._hashes.clear()
+        self._memory.clear()
+        self._chars = 0
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+_process_classifier = None
+
+
+def _init_scan_process(tags_data, search_in_name, search_in_file, tag_search_rows, ocr_db_path, ocr_max_bytes,
+                       log_queue):
+    """Создает классификатор в дочернем процессе пула. Лог отправляется в очередь
+    log_queue, а в файл его пишет основной процесс: несколько процессов с одним
+    RotatingFileHandler теряют строки при ротации"""
+    global _process_classifier
+    logger = logging.getLogger("PEDSorter")
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    logger.addHandler(QueueHandler(log_queue))
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    _process_classifier = FileClassifier(
+        TagsManager(tags_data), logger,
+        search_in_name=search_in_name, search_in_file=search_in_file, tag_search_rows=tag_search_rows,
+        cache_chars=5_000_000, ocr_cache=OcrCache(ocr_db_path, ocr_max_bytes))
+    # процессы пула - отдельные интерпретаторы, прогрев окна до них не доходит;
+    # без лога: отсутствующую библиотеку покажет ошибка обработки первого же файла
+    warm_up()
+
+
+def _detect_in_process(filepath, filename):
+    return _process_classifier.detect(filepath, filename)
+
+
+class CopyJournal:
+    """Журнал копирования в папке назначения (JSON lines, только дописывается).
+
+    По журналу повторный запуск пропускает файлы, которые уже скопированы и
+    не менялись с тех пор, и докопирует оставшиеся от прерванного запуска .part.
+    Хэш SHA-256 считается в том же проходе чтения, что и копирование, и
+    попадает в манифест, который можно проверить командой sha256sum -c"""
+    FILENAME = '.ped_copy_journal.jsonl'
+    MANIFEST = 'manifest.sha256'
+
+    def __init__(self, target_dir):
+        self.target_dir = str(target_dir)
+        self.path = os.path.join(self.target_dir, self.FILENAME)
+        self._lock = threading.Lock()
+        self._planned = None
+        self._done = None
+        self._file = None
+
+    def load(self):
+        """Читает журнал прошлых запусков"""
+        if self._planned is not None:
+            return
+        self._planned = {}
+        self._done = {}
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue # строка, которую не успели дописать
+                if entry.get('event') == 'planned':
+                    self._planned[entry['target']] = entry
+                elif entry.get('event') == 'done':
+                    self._done[entry['target']] = entry
+
+    def open(self):
+        self.load()
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    def close(self):
+        """Закрывает журнал и пишет манифест по всем скопированным файлам"""
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+        lines = [f"{entry['sha256']}  {name}" for name, entry in sorted(self._done.items())
+                 if os.path.exists(os.path.join(self.target_dir, name))]
+        with open(os.path.join(self.target_dir, self.MANIFEST), 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n' if lines else '')
+
+    @staticmethod
+    def _matches(entry, source, stat):
+        return (entry is not None and entry['source'] == str(source)
+                and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns)
+
+    def is_done(self, source, target, stat=None):
+        """Файл уже скопирован из того же, не изменившегося исходника, и копию с тех пор
+        не меняли (размер и время изменения копии - как при записи в журнал).
+        Быстрая проверка без чтения копии, содержимое сверяет verify"""
+        self.load()
+        try:
+            stat = stat or os.stat(source)
+            entry = self._done.get(os.path.basename(target))
+            if not self._matches(entry, source, stat):
+                return False
+            target_stat = os.stat(target)
+            return (target_stat.st_size == stat.st_size
+                    and entry.get('target_mtime_ns') == target_stat.st_mtime_ns)
+        except OSError:
+            return False
+
+    def verify(self, target):
+        """Пересчитывает SHA-256 копии и сравнивает с записанным в журнал"""
+        entry = self._done.get(os.path.basename(target))
+        if entry is None:
+            return False
+        digest = hashlib.sha256()
+        try:
+            with open(target, 'rb') as f:
+                for chunk in iter(lambda: f.read(CopyEngine.BUFFER_SIZE), b''):
+                    digest.update(chunk)
+        except OSError:
+            return False
+        return digest.hexdigest() == entry['sha256']
+
+    def can_resume(self, source, target, stat):
+        """.part прошлого запуска копировался из того же, не изменившегося исходника"""
+        return self._matches(self._planned.get(os.path.basename(target)), source, stat)
+
+    def _write(self, entry):
+        with self._lock:
+            self._file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            self._file.flush()
+
+    def plan(self, source, target, stat):
+        self._write({'event': 'planned', 'source': str(source), 'target': os.path.basename(target),
+                     'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns})
+
+    def done(self, source, target, stat, sha256):
+        entry = {'event': 'done', 'source': str(source), 'target': os.path.basename(target),
+                 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': sha256,
+                 'target_mtime_ns': os.stat(target).st_mtime_ns}
+        self._write(entry)
+        with self._lock:
+            self._done[entry['target']] = entry
+
+
+class CopyEngine:
+    """Копирование файлов с новыми именами пулом потоков. Файл копируется
+    средствами ОС (copy_file_range/sendfile), где они есть, иначе большими
+    блоками, сначала во временный .part, который переименовывается в конце.
+    С журналом копирование идет блоками, чтобы считать хэш в том же проходе"""
+    BUFFER_SIZE = 8 * 1024 * 1024
+    PART_SUFFIX = '.part'
+    FALLBACK_ERRORS = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EBADF, errno.ENOTSUP, errno.EOPNOTSUPP}
+
+    def __init__(self, logger, threads=4):
+        self.logger = logger
+        self.threads = max(1, threads)
+        self._lock = threading.Lock()
+        self._done_bytes = 0
+
+    def copy_all(self, operations, progress=None, cancelled=None, journal=None):
+        """operations - [(исходный путь, путь копии, подпись для лога)].
+        progress(скопировано байт, всего байт) вызывается из потоков пула"""
+        cancelled = cancelled or threading.Event()
+        results = {'success': 0, 'verified': 0, 'errors': 0, 'skipped': 0}
+        total = 0
+        for source, _, _ in operations:
+            try:
+                total += os.path.getsize(source)
+            except OSError:
+                pass
+        self._done_bytes = 0
+
+        def on_chunk(size):
+            with self._lock:
+                self._done_bytes += size
+                done = self._done_bytes
+            if progress is not None:
+                progress(done, total)
+
+        if journal is not None:
+            journal.open()
+        try:
+            with ThreadPoolExecutor(max_workers=self.threads) as pool:
+                futures = {pool.submit(self.copy_file, source, target, on_chunk, cancelled, journal): label
+                           for source, target, label in operations}
+                for future in as_completed(futures):
+                    label = futures[future]
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        self.logger.error(f"Ошибка: {label}: {str(e)}")
+                        results['errors'] += 1
+                        continue
+                    if result == 'success':
+                        self.logger.info(f"Скопирован: {label}")
+                    elif result == 'verified':
+                        self.logger.info(f"Уже скопирован ранее: {label}")
+                    results[result] += 1
+        finally:
+            if journal is not None:
+                journal.close()
+        return results
+
+    def copy_file(self, source, target, on_chunk=None, cancelled=None, journal=None):
+        """Копирует файл с атрибутами. Возвращает 'success', 'verified' - файл
+        уже скопирован по журналу и SHA-256 копии совпал, или 'skipped' - копирование отменили.
+        С журналом недокопированный .part остается для следующего запуска"""
+        if cancelled is not None and cancelled.is_set():
+            return 'skipped'
+        on_chunk = on_chunk or (lambda size: None)
+        stat = os.stat(source)
+        part = str(target) + self.PART_SUFFIX
+        offset = 0
+        digest = None
+        if journal is not None:
+            if journal.is_done(source, target, stat):
+                if journal.verify(target):
+                    on_chunk(stat.st_size)
+                    return 'verified'
+                self.logger.warning(f"Копия {target} не совпадает с журналом, копируется заново")
+            digest = hashlib.sha256()
+            if journal.can_resume(source, target, stat) and os.path.exists(part):
+                offset = os.path.getsize(part)
+                if offset > stat.st_size:
+                    offset = 0
+            journal.plan(source, target, stat)
+        try:
+            with open(source, 'rb') as src, open(part, 'r+b' if offset else 'wb') as dst:
+                if offset and not self._hash_prefix(src, dst, offset, digest):
+                    self.logger.warning(f"Недокопированный {part} не совпадает с исходным файлом, "
+                                        f"копируется заново")
+                    digest = hashlib.sha256()
+                    offset = 0
+                    src.seek(0)
+                    dst.seek(0)
+                    dst.truncate()
+                if offset:
+                    # докопирование: уже записанная часть совпала с исходником, дальше с того же места
+                    on_chunk(offset)
+                copied = self._copy_stream(src, dst, on_chunk, cancelled, digest)
+            if copied:
+                if os.path.getsize(part) != stat.st_size:
+                    raise OSError(f"размер копии не совпадает с исходным файлом ({stat.st_size} байт)")
+                shutil.copystat(source, part)
+                os.replace(part, target)
+                if journal is not None:
+                    journal.done(source, target, stat, digest.hexdigest())
+        except BaseException:
+            if journal is None:
+                self._remove(part)
+            raise
+        if not copied and journal is None:
+            self._remove(part)
+        return 'success' if copied else 'skipped'
+
+    def _hash_prefix(self, src, dst, offset, digest):
+        """Сверяет первые offset байт .part с исходником и считает их хэш по байтам
+        исходника. Возвращает False, если .part не совпадает (например, после сбоя
+        в нем остались нули); тогда digest уже испорчен и не годится"""
+        src.seek(0)
+        dst.seek(0)
+        remaining = offset
+        while remaining:
+            chunk = src.read(min(self.BUFFER_SIZE, remaining))
+            if not chunk or dst.read(len(chunk)) != chunk:
+                return False
+            digest.update(chunk)
+            remaining -= len(chunk)
+        dst.seek(offset)
+        dst.truncate()
+        return True
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _kernel_copies(self):
+        """Копирование без чтения в память процесса, если ОС умеет"""
+        copies = []
+        if hasattr(os, 'copy_file_range'):
+            copies.append(lambda infd, outfd, offset: os.copy_file_range(infd, outfd, self.BUFFER_SIZE, offset, offset))
+        if hasattr(os, 'sendfile') and sys.platform.startswith('linux'):
+            copies.append(lambda infd, outfd, offset: os.sendfile(outfd, infd, offset, self.BUFFER_SIZE))
+        return copies
+
+    def _copy_stream(self, src, dst, on_chunk, cancelled, digest=None):
+        if digest is None:
+            infd, outfd = src.fileno(), dst.fileno()
+            expected = os.fstat(infd).st_size
+            for kernel_copy in self._kernel_copies():
+                offset = 0
+                try:
+                    while True:
+                        if cancelled is not None and cancelled.is_set():
+                            return False
+                        size = kernel_copy(infd, outfd, offset)
+                        if not size:
+                            break
+                        offset += size
+                        on_chunk(size)
+                except OSError as e:
+                    # файловая система не поддерживает способ - пробуем следующий, пока ничего не записано
+                    if offset or e.errno not in self.FALLBACK_ERRORS:
+                        raise
+                    continue
+                if offset or not expected:
+                    return True
+        buffer = bytearray(self.BUFFER_SIZE)
+        view = memoryview(buffer)
+        while True:
+            if cancelled is not None and cancelled.is_set():
+                return False
+            size = src.readinto(buffer)
+            if not size:
+                return True
+            dst.write(view[:size])
+            if digest is not None:
+                digest.update(view[:size])
+            on_chunk(size)
+
+
+class Scanner:
+    """Обход директории и определение типов файлов. Результаты отдаются
+    пачками через колбэки не чаще, чем раз в PROGRESS_INTERVAL секунд"""
+    PROGRESS_INTERVAL = 0.1
+    ENUM_THREADS = 8
+    SKIP_EXTENSIONS = {
+        '.jpg', '.jpeg', '.png', '.bmp', '.gif', '.tif', '.tiff', # картинки
+        '.dwg', '.dxf', '.zip', '.rar', '.7z', # чертежи и архивы
+    }
+    EXCLUDE_GLOBS = ['~$*', 'Thumbs.db', 'desktop.ini']
+    DEDUP_BLOCK = 64 * 1024
+
+    def __init__(self, directory, classifier, workers=1, scan_cache=None, full_rescan=False,
+                 include=None, exclude=None, deduplicate=True):
+        self.directory = directory
+        self.deduplicate = deduplicate
+        self.include = list(include or [])
+        self.exclude = self.EXCLUDE_GLOBS + list(exclude or [])
+        self.classifier = classifier
+        self.workers = max(1, workers)
+        self.scan_cache = scan_cache
+        self.full_rescan = full_rescan
+        self.report = ScanReport(directory)
+        self._cancelled = threading.Event()
+        self._resumed = threading.Event()
+        self._resumed.set()
+
+    def pause(self):
+        self._resumed.clear()
+
+    def resume(self):
+        self._resumed.set()
+
+    def is_paused(self):
+        return not self._resumed.is_set()
+
+    def cancel(self):
+        self._cancelled.set()
+        self._resumed.set()
+
+    def _is_excluded(self, name, relpath):
+        return any(fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(relpath, pattern)
+                   for pattern in self.exclude)
+
+    def _accept_file(self, name, relpath):
+        """Фильтр до открытия файла: маски исключения, маски включения и расширение.
+        Файлы с SKIP_EXTENSIONS пропускаются, только если масок включения нет:
+        маска вроде *.jpg возвращает сканы, которые определяются по имени"""
+        if self._is_excluded(name, relpath):
+            return False
+        if self.include:
+            return any(fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(relpath, pattern)
+                       for pattern in self.include)
+        return os.path.splitext(name)[1].lower() not in self.SKIP_EXTENSIONS
+
+    def _list_directory(self, directory, relpath):
+        """Одно чтение папки. Возвращает подходящие файлы со stat из DirEntry,
+        подпапки и число отброшенных фильтрами файлов"""
+        files = []
+        subdirs = []
+        skipped = 0
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    entry_relpath = f'{relpath}/{entry.name}' if relpath else entry.name
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if not self._is_excluded(entry.name, entry_relpath):
+                                subdirs.append((entry.path, entry_relpath))
+                        elif entry.is_file():
+                            if self._accept_file(entry.name, entry_relpath):
+                                files.append((entry.name, entry.path, entry.stat()))
+                            else:
+                                skipped += 1
+                    except OSError as e:
+                        self.classifier.logger.error(f"Ошибка чтения {entry.path}: {str(e)}")
+        except OSError as e:
+            self.classifier.logger.error(f"Не удалось прочитать папку {directory}: {str(e)}")
+        return files, subdirs, skipped
+
+    def _collect_files(self):
+        """Обход директории. Папки читаются параллельно (на сетевом диске каждое
+        чтение - отдельный запрос), а файлы возвращаются в порядке os.walk, чтобы
+        нумерация подтверждающих документов не зависела от потоков.
+        Возвращает [(имя, путь)], [stat] и число пропущенных файлов"""
+        listings = {}
+        pool = ThreadPoolExecutor(max_workers=self.ENUM_THREADS)
+        try:
+            pending = {pool.submit(self._list_directory, self.directory, ''): self.directory}
+            while pending and not self._cancelled.is_set():
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    listings[pending.pop(future)] = listing = future.result()
+                    for path, relpath in listing[1]:
+                        pending[pool.submit(self._list_directory, path, relpath)] = path
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+        files = []
+        stats = []
+        skipped = 0
+        stack = [self.directory]
+        while stack:
+            dir_files, subdirs, dir_skipped = listings.get(stack.pop(), ((), (), 0))
+            for name, path, stat in dir_files:
+                files.append((name, Path(path)))
+                stats.append(stat)
+            skipped += dir_skipped
+            stack.extend(path for path, _ in reversed(subdirs))
+        return files, stats, skipped
+
+    def _partial_hash(self, filepath, size):
+        """Хэш первого и последнего блоков. Маленький файл читается целиком"""
+        try:
+            digest = hashlib.sha1()
+            with open(filepath, 'rb') as f:
+                digest.update(f.read(self.DEDUP_BLOCK))
+                if size > 2 * self.DEDUP_BLOCK:
+                    f.seek(size - self.DEDUP_BLOCK)
+                digest.update(f.read(self.DEDUP_BLOCK))
+            return digest.hexdigest()
+        except OSError:
+            return None
+
+    def _full_hash(self, filepath, size):
+        try:
+            digest = hashlib.sha1()
+            with open(filepath, 'rb') as f:
+                while not self._cancelled.is_set():
+                    chunk = f.read(1024 * 1024)
+                    if not chunk:
+                        return digest.hexdigest()
+                    digest.update(chunk)
+        except OSError:
+            return None
+
+    def _find_duplicates(self, files, stats):
+        """Ищет файлы с одинаковым содержимым: по размеру, потом по хэшу первого
+        и последнего блоков и только при совпадении - по хэшу всего файла.
+        Возвращает {индекс копии: индекс первого такого файла в порядке обхода}.
+        Разбирается только первый файл группы (по порядку обхода папок, как в os.walk),
+        остальные получают его тип"""
+        by_size = {}
+        for index, stat in enumerate(stats):
+            if stat.st_size:
+                by_size.setdefault(stat.st_size, []).append(index)
+        indices = [index for group in by_size.values() if len(group) > 1 for index in group]
+        found = []
+        with ThreadPoolExecutor(max_workers=self.ENUM_THREADS) as pool:
+            for hash_file in (self._partial_hash, self._full_hash):
+                if not indices or self._cancelled.is_set():
+                    break
+                digests = pool.map(lambda index: hash_file(files[index][1], stats[index].st_size), indices)
+                groups = {}
+                for index, digest in zip(indices, digests):
+                    if digest is not None:
+                        groups.setdefault((stats[index].st_size, digest), []).append(index)
+                indices = []
+                for group in groups.values():
+                    if len(group) < 2:
+                        continue
+                    # маленькие файлы первый хэш уже прочитал целиком
+                    if hash_file == self._full_hash or stats[group[0]].st_size <= 2 * self.DEDUP_BLOCK:
+                        found.append(group)
+                    else:
+                        indices.extend(group)
+        if self._cancelled.is_set():
+            return {}
+        return {index: min(group) for group in found for index in group if index != min(group)}
+
+    def _detect_serial(self, files):
+        """Определяет типы файлов по очереди в текущем потоке"""
+        for filename, filepath in files:
+            self._resumed.wait()
+            if self._cancelled.is_set():
+                return
+            try:
+                yield self.classifier.detect(filepath, filename)
+            except Exception as e:
+                self.classifier.logger.error(f"Ошибка обработки файла {filepath}: {str(e)}")
+                yield self.classifier.failed(filepath)
+
+    def _detect_parallel(self, files):
+        """Раздает файлы пулу процессов и отдает результаты в порядке обхода,
+        чтобы нумерация подтверждающих документов не зависела от планировщика"""
+        tags_manager = self.classifier.tags_manager
+        ocr_cache = self.classifier.ocr_cache or OcrCache()
+        log_queue = multiprocessing.Queue()
+        log_listener = QueueListener(log_queue, *self.classifier.logger.handlers, respect_handler_level=True)
+        log_listener.start()
+        pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_scan_process,
+            initargs=(tags_manager.tags_data, self.classifier.search_in_name, self.classifier.search_in_file,
+                      self.classifier.TAG_SEARCH_ROWS, ocr_cache.db_path, ocr_cache.max_bytes, log_queue))
+        pending = {}
+        ready = {}
+        next_to_submit = 0
+        next_to_yield = 0
+        try:
+            while next_to_yield < len(files):
+                if self._cancelled.is_set():
+                    return
+                # держим в очереди не больше двух файлов на процесс, чтобы пауза и отмена срабатывали сразу
+                while (next_to_submit < len(files) and len(pending) < self.workers * 2
+                       and self._resumed.is_set()):
+                    filename, filepath = files[next_to_submit]
+                    pending[pool.submit(_detect_in_process, filepath, filename)] = next_to_submit
+                    next_to_submit += 1
+                if not pending:
+                    self._resumed.wait(self.PROGRESS_INTERVAL)
+                    continue
+                done, _ = wait(pending, timeout=self.PROGRESS_INTERVAL, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = pending.pop(future)
+                    try:
+                        ready[index] = future.result()
+                    except Exception as e:
+                        self.classifier.logger.error(f"Ошибка обработки файла {files[index][1]}: {str(e)}")
+                        ready[index] = self.classifier.failed(files[index][1])
+                while next_to_yield in ready:
+                    yield ready.pop(next_to_yield)
+                    next_to_yield += 1
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+            log_listener.stop()
+
+    def _detect(self, files):
+        if self.workers > 1 and len(files) > 1:
+            return self._detect_parallel(files)
+        return self._detect_serial(files)
+
+    def _detect_with_cache(self, files, stats):
+        """Берет результаты неизменившихся файлов из кэша, остальные файлы
+        обрабатывает и сохраняет, кроме результатов с ошибками чтения.
+        Результаты отдаются в порядке обхода"""
+        cached = []
+        for (_, filepath), stat in zip(files, stats):
+            if self.full_rescan:
+                cached.append(None)
+            else:
+                cached.append(self.scan_cache.get(filepath, stat))
+        detected = self._detect([file for file, data in zip(files, cached) if data is None])
+        for (_, filepath), stat, data in zip(files, stats, cached):
+            self._resumed.wait()
+            if self._cancelled.is_set():
+                return
+            if data is None:
+                data = next(detected, StopIteration)
+                if data is StopIteration:
+                    return
+                # при ошибке чтения или OCR (файл открыт в Excel, нет модуля) файл разбирается заново
+                if not data.get('read_failed'):
+                    self.scan_cache.put(filepath, stat, data)
+            yield data
+
+    def _emit_names(self, files, on_names, chunk=500):
+        """Отдает предварительные результаты по именам всех файлов"""
+        for start in range(0, len(files), chunk):
+            if self._cancelled.is_set():
+                return
+            on_names([self.classifier.detect_by_name(filepath, filename)
+                      for filename, filepath in files[start:start + chunk]])
+
+    def run(self, on_enumerated=None, on_names=None, on_progress=None):
+        """Поиск целиком. on_enumerated(найдено файлов, пропущено фильтрами, секунд на обход),
+        on_names([предварительные данные по имени файла]), on_progress(обработано, всего, [данные]).
+        Время этапов собирается в self.report. Возвращает True, если поиск прерван"""
+        on_progress = on_progress or (lambda files_count, total, batch: None)
+        started_all = started = time.monotonic()
+        files, stats, skipped = self._collect_files()
+        enumerate_seconds = time.monotonic() - started
+        self.report.add('enumerate', enumerate_seconds)
+        if on_enumerated is not None:
+            on_enumerated(len(files), skipped, enumerate_seconds)
+        total = len(files)
+        if on_names is not None:
+            self._emit_names(files, on_names)
+        duplicates = {}
+        if self.deduplicate:
+            started = time.monotonic()
+            duplicates = self._find_duplicates(files, stats)
+            self.classifier.logger.info(
+                f"Дубликаты: {len(duplicates)} копий {len(set(duplicates.values()))} файлов "
+                f"({time.monotonic() - started:.2f} с)")
+        unique = [index for index in range(total) if index not in duplicates]
+        has_copies = set(duplicates.values())
+        representatives = {}
+        batch = []
+        files_count = 0
+        last_emit = time.monotonic()
+        if self.scan_cache is not None:
+            self.scan_cache.open()
+            detected = self._detect_with_cache([files[i] for i in unique], [stats[i] for i in unique])
+        else:
+            detected = self._detect([files[i] for i in unique])
+        try:
+            for index, (filename, filepath) in enumerate(files):
+                if index in duplicates:
+                    # копия получает тип первого такого же файла без повторного разбора,
+                    # а имя - от своего имени файла
+                    original = duplicates[index]
+                    data = representatives[original]
+                    self.report.duplicates += 1
+                    data = dict(data, filepath=filepath, extension=filepath.suffix.lower(),
+                                new_name=self.classifier.name_for_copy(data, filename, files[original][0]),
+                                stages=[], stage=None, duplicate_of=str(data['filepath']))
+                else:
+                    data = next(detected, StopIteration)
+                    if data is StopIteration:
+                        break
+                    timings = data.pop('timings', None)
+                    naming_started = time.perf_counter()
+                    data = self.classifier.number_document(filename, data)
+                    if timings is not None:
+                        timings['naming'] = timings.get('naming', 0.0) + time.perf_counter() - naming_started
+                    self.report.add_file(filepath, timings)
+                    if index in has_copies:
+                        representatives[index] = data
+                batch.append(data)
+                files_count += 1
+                now = time.monotonic()
+                if now - last_emit >= self.PROGRESS_INTERVAL:
+                    on_progress(files_count, total, batch)
+                    batch = []
+                    last_emit = now
+                    if self.scan_cache is not None:
+                        self.scan_cache.commit()
+            if self.scan_cache is not None and not self._cancelled.is_set():
+                self.scan_cache.prune(self.directory, {str(filepath) for _, filepath in files})
+        finally:
+            if self.scan_cache is not None:
+                self.scan_cache.close()
+        on_progress(files_count, total, batch)
+        self.report.wall = time.monotonic() - started_all
+        self.classifier.document_cache.clear()
+        if self.classifier.ocr_cache is not None:
+            self.classifier.ocr_cache.close()
+        return self._cancelled.is_set()
+
+
+LOG_DIR = "logs"
+
+
+def scan_report_path():
+    """Файл отчета о поиске, рядом с дневным логом"""
+    return os.path.join(LOG_DIR, f"scan_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+
+
+def setup_logging(console_level=logging.DEBUG):
+    """Настройки логирования."""
+    logger = logging.getLogger("PEDSorter")
+    if logger.handlers:
+        return logger
+
+    if not os.path.exists(LOG_DIR):
+        os.makedirs(LOG_DIR)
+
+    log_file = os.path.join(LOG_DIR, f"ped_sorter_{datetime.now().strftime('%Y%m%d')}.log")
+
+    logger.setLevel(logging.DEBUG)
+
+    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+
+    file_handler = RotatingFileHandler(
+        log_file, maxBytes=5*1024*1024, backupCount=3, encoding='utf-8'
+    )
+    file_handler.setFormatter(formatter)
+
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(formatter)
+    console_handler.setLevel(console_level)
+
+    logger.addHandler(file_handler)
+    logger.addHandler(console_handler)
+
+    return logger
+
+
+def scan_directory(directory, search_in_name=True, search_in_file=True, workers=1, use_cache=True,
+                   full_rescan=False, include=None, exclude=None, deduplicate=True,
+                   tag_search_rows=None, logger=None, on_progress=None):
+    """Поиск по директории целиком, без окна. Возвращает ScanResults
+    (с инфой xls, переданной тёскам), ScanReport и признак прерванного поиска"""
+    logger = logger or setup_logging()
+    tags_manager = TagsManager()
+    classifier = FileClassifier(
+        tags_manager, logger, search_in_name=search_in_name, search_in_file=search_in_file,
+        ocr_cache=OcrCache(tags_manager.exec_dir / 'ocr_cache.sqlite'), tag_search_rows=tag_search_rows)
+    scan_cache = None
+    if use_cache:
+        scan_cache = ScanCache(tags_manager.exec_dir / 'scan_cache.sqlite', classifier.config_key(), logger=logger)
+    scanner = Scanner(directory, classifier, workers, scan_cache=scan_cache, full_rescan=full_rescan,
+                      include=include, exclude=exclude, deduplicate=deduplicate)
+    results = ScanResults(directory)
+
+    def collect(files_count, total, batch):
+        for data in batch:
+            results.put(data)
+        if on_progress is not None:
+            on_progress(files_count, total)
+
+    cancelled = scanner.run(on_progress=collect)
+    results.share_xls_info()
+    return results, scanner.report, cancelled
+
+
+EXIT_OK = 0
+EXIT_INCOMPLETE = 1 # есть файлы с неопределенным типом или ошибки копирования
+EXIT_USAGE = 2
+EXIT_INTERRUPTED = 130
+
+
+def _print_json(entry):
+    print(json.dumps(entry, ensure_ascii=False), flush=True)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='python -m ped_engine',
+        description='Сортировка пакета сметной документации без окна. Вывод - JSON lines.',
+        epilog=f'Коды выхода: {EXIT_OK} - все в порядке, {EXIT_INCOMPLETE} - есть файлы с неопределенным '
+               f'типом или ошибки копирования, {EXIT_USAGE} - неверные аргументы, '
+               f'{EXIT_INTERRUPTED} - прервано')
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('directory', help='папка ПСД')
+    common.add_argument('--no-name-tags', action='store_true', help='не искать по тэгам в имени файла')
+    common.add_argument('--no-content-tags', action='store_true', help='не искать по тэгам в содержимом файла')
+    common.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='число процессов')
+    common.add_argument('--no-cache', action='store_true', help='не использовать кэш результатов')
+    common.add_argument('--full-rescan', action='store_true', help='обработать все файлы заново и обновить кэш')
+    common.add_argument('--include', action='append', default=[], metavar='МАСКА',
+                        help='искать только файлы по маске (можно несколько раз); картинки, чертежи '
+                             'и архивы ищутся, только если их указать маской, например *.jpg')
+    common.add_argument('--exclude', action='append', default=[], metavar='МАСКА',
+                        help='исключить файлы или папки по маске (можно несколько раз)')
+    common.add_argument('--tag-rows', type=int, default=None, metavar='N',
+                        help='искать внутренние тэги таблиц только в первых N строках (по умолчанию - во всем листе)')
+    common.add_argument('--no-dedup', action='store_true',
+                        help='не искать копии файлов (копия получает тип первого по порядку обхода '
+                             'такого же файла, он указан в поле duplicate_of)')
+    common.add_argument('-v', '--verbose', action='store_true', help='подробный лог в stderr')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('scan', parents=[common], help='определить типы и новые имена файлов')
+    rename = commands.add_parser('rename', parents=[common], help='скопировать готовые файлы с новыми именами')
+    rename.add_argument('target', help='папка для копий')
+    rename.add_argument('--dry-run', action='store_true', help='только показать план копирования')
+    rename.add_argument('--overwrite', action='store_true', help='перезаписывать существующие файлы')
+    export = commands.add_parser('export', parents=[common], help='сохранить результаты в .csv или .jsonl')
+    export.add_argument('output', help='файл результатов')
+    return parser
+
+
+def _export(results, ready, output):
+    rows = [results.to_dict(record, record.path in ready) for record in results]
+    if output.lower().endswith('.csv'):
+        with open(output, 'w', encoding='utf-8-sig', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]) if rows else ['path'], delimiter=';')
+            writer.writeheader()
+            writer.writerows(rows)
+    else:
+        with open(output, 'w', encoding='utf-8') as f:
+            for row in rows:
+                f.write(json.dumps(row, ensure_ascii=False) + '\n')
+
+
+def _rename(results, ready_records, args, logger):
+    operations = []
+    skipped = 0
+    journal = CopyJournal(args.target)
+    journal.load()
+    for record in ready_records:
+        source = results.full_path(record)
+        target = os.path.join(args.target, record.final_name)
+        if os.path.exists(target) and not args.overwrite and not journal.is_done(source, target):
+            _print_json({'event': 'skipped', 'source': record.path, 'target': record.final_name,
+                         'reason': 'exists'})
+            skipped += 1
+            continue
+        operations.append((source, target, f'{record.path} -> {record.final_name}'))
+        if args.dry_run:
+            _print_json({'event': 'planned', 'source': record.path, 'target': record.final_name})
+    if args.dry_run:
+        return {'success': 0, 'verified': 0, 'errors': 0, 'skipped': skipped, 'planned': len(operations)}
+    os.makedirs(args.target, exist_ok=True)
+    copy_results = CopyEngine(logger).copy_all(operations, journal=journal)
+    copy_results['skipped'] += skipped
+    return copy_results
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if not os.path.isdir(args.directory):
+        print(f'Папка не найдена: {args.directory}', file=sys.stderr)
+        return EXIT_USAGE
+    logger = setup_logging(logging.INFO if args.verbose else logging.WARNING)
+    try:
+        results, report, cancelled = scan_directory(
+            args.directory, search_in_name=not args.no_name_tags, search_in_file=not args.no_content_tags,
+            workers=args.workers, use_cache=not args.no_cache, full_rescan=args.full_rescan,
+            include=args.include, exclude=args.exclude, deduplicate=not args.no_dedup,
+            tag_search_rows=args.tag_rows, logger=logger)
+        ready_records = results.ready_for_copy()
+        ready = {record.path for record in ready_records}
+        unknown = sum(record.type == '?' for record in results)
+        summary = {'event': 'summary', 'command': args.command, 'files': len(results),
+                   'ready': len(ready), 'unknown': unknown}
+        report_path = scan_report_path()
+        try:
+            report.save(report_path)
+            summary['report'] = report_path
+        except OSError as e:
+            logger.warning(f"Не удалось сохранить отчет о поиске: {str(e)}")
+        incomplete = bool(unknown)
+        if cancelled:
+            summary['cancelled'] = True
+        if args.command == 'scan':
+            for record in results:
+                _print_json({'event': 'file', **results.to_dict(record, record.path in ready)})
+        elif args.command == 'export':
+            _export(results, ready, args.output)
+            summary['output'] = args.output
+        elif args.command == 'rename' and not cancelled:
+            # по прерванному поиску не копируем: нумерация и состав пакета неполные
+            copy_results = _rename(results, ready_records, args, logger)
+            summary.update(copy_results)
+            incomplete = incomplete or bool(copy_results['errors'])
+        _print_json(summary)
+        if cancelled:
+            return EXIT_INTERRUPTED
+        return EXIT_INCOMPLETE if incomplete else EXIT_OK
+    except KeyboardInterrupt:
+        return EXIT_INTERRUPTED
+
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    sys.exit(main())
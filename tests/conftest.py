@@ -0,0 +1,34 @@
+import os
+import sys
+import logging
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ped_engine
+
+
+TAGS = {
+    "1": {"type": "Локальная смета", "name_tags": ["локальная смета", "лс"],
+          "internal_tags": ["локальная смета"], "mask": "ЛС"},
+    "2": {"type": "Объектная смета", "name_tags": ["ос"],
+          "internal_tags": ["объектн[а-яё]*\\s+смет"], "mask": "ОС"},
+    "8.3": {"type": "Коммерческое предложение", "name_tags": ["кп"],
+            "internal_tags": ["коммерческ[а-яё]*\\s+предложен"], "mask": "КП"},
+}
+
+
+@pytest.fixture
+def logger():
+    return logging.getLogger("PEDSorter.tests")
+
+
+@pytest.fixture
+def tags_manager():
+    return ped_engine.TagsManager({type_id: dict(data) for type_id, data in TAGS.items()})
+
+
+@pytest.fixture
+def classifier(tags_manager, logger):
+    return ped_engine.FileClassifier(tags_manager, logger, search_in_file=False)
@@ -0,0 +1,112 @@
+import json
+import logging
+import os
+
+import pytest
+
+import ped_engine
+from ped_engine import EXIT_INCOMPLETE, EXIT_INTERRUPTED, EXIT_OK, EXIT_USAGE, main
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    # лог и отчет о поиске пишутся в logs/ текущей папки
+    monkeypatch.chdir(tmp_path)
+    yield tmp_path
+    logger = logging.getLogger('PEDSorter')
+    for handler in logger.handlers[:]:
+        logger.removeHandler(handler)
+        handler.close()
+
+
+def run(capsys, *argv):
+    exit_code = main([*argv, '--no-cache', '--workers', '1', '--no-content-tags'])
+    return exit_code, [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+
+def make_package(root, *names):
+    root.mkdir()
+    for name in names:
+        (root / name).write_bytes(name.encode())
+    return root
+
+
+def test_missing_directory_is_usage_error(capsys, workdir):
+    assert main(['scan', str(workdir / 'нет такой')]) == EXIT_USAGE
+    assert 'Папка не найдена' in capsys.readouterr().err
+
+
+def test_unknown_files_give_incomplete_exit_code(capsys, workdir):
+    package = make_package(workdir / 'пакет', 'КП поставщика.pdf', 'непонятный файл.pdf')
+    exit_code, lines = run(capsys, 'scan', str(package))
+    assert exit_code == EXIT_INCOMPLETE
+    summary = lines[-1]
+    assert (summary['event'], summary['files'], summary['unknown']) == ('summary', 2, 1)
+    assert os.path.exists(summary['report'])
+    types = {line['path']: line['type'] for line in lines if line['event'] == 'file'}
+    assert types == {'КП поставщика.pdf': 'Коммерческое предложение', 'непонятный файл.pdf': '?'}
+
+
+def test_known_files_give_ok(capsys, workdir):
+    package = make_package(workdir / 'пакет', 'КП поставщика.pdf')
+    exit_code, lines = run(capsys, 'scan', str(package))
+    assert exit_code == EXIT_OK
+    assert lines[-1]['ready'] == 1
+
+
+def test_rename_dry_run_only_plans(capsys, workdir):
+    package = make_package(workdir / 'пакет', 'КП поставщика.pdf')
+    target = workdir / 'результат'
+    exit_code, lines = run(capsys, 'rename', str(package), str(target), '--dry-run')
+    assert exit_code == EXIT_OK
+    planned = [line for line in lines if line['event'] == 'planned']
+    assert [line['source'] for line in planned] == ['КП поставщика.pdf']
+    assert lines[-1]['planned'] == 1
+    assert not target.exists()
+
+
+def test_rename_copies_and_second_run_verifies(capsys, workdir):
+    package = make_package(workdir / 'пакет', 'КП поставщика.pdf')
+    target = workdir / 'результат'
+    exit_code, lines = run(capsys, 'rename', str(package), str(target))
+    assert exit_code == EXIT_OK and lines[-1]['success'] == 1
+    copies = [name for name in os.listdir(target) if name.endswith('.pdf')]
+    assert len(copies) == 1
+    exit_code, lines = run(capsys, 'rename', str(package), str(target))
+    assert exit_code == EXIT_OK
+    assert (lines[-1]['success'], lines[-1]['verified']) == (0, 1)
+
+
+def test_export_jsonl(capsys, workdir):
+    package = make_package(workdir / 'пакет', 'КП поставщика.pdf', 'непонятный файл.pdf')
+    output = workdir / 'результаты.jsonl'
+    exit_code, lines = run(capsys, 'export', str(package), str(output))
+    assert exit_code == EXIT_INCOMPLETE
+    rows = [json.loads(line) for line in output.read_text(encoding='utf-8').splitlines()]
+    assert sorted(row['path'] for row in rows) == ['КП поставщика.pdf', 'непонятный файл.pdf']
+    assert lines[-1]['output'] == str(output)
+
+
+def test_rename_with_unknown_files_is_incomplete(capsys, workdir):
+    package = make_package(workdir / 'пакет', 'КП поставщика.pdf', 'непонятный файл.pdf')
+    exit_code, lines = run(capsys, 'rename', str(package), str(workdir / 'результат'))
+    assert (lines[-1]['success'], lines[-1]['errors'], lines[-1]['unknown']) == (1, 0, 1)
+    assert exit_code == EXIT_INCOMPLETE
+
+
+@pytest.mark.parametrize('command', ['scan', 'rename'])
+def test_cancelled_scan_is_interrupted(capsys, workdir, monkeypatch, command):
+    package = make_package(workdir / 'пакет', 'КП поставщика.pdf')
+    target = workdir / 'результат'
+    scan_directory = ped_engine.scan_directory
+
+    def cancelled_scan(*args, **kwargs):
+        results, report, _ = scan_directory(*args, **kwargs)
+        return results, report, True
+
+    monkeypatch.setattr(ped_engine, 'scan_directory', cancelled_scan)
+    argv = [command, str(package)] + ([str(target)] if command == 'rename' else [])
+    exit_code, lines = run(capsys, *argv)
+    assert exit_code == EXIT_INTERRUPTED
+    assert lines[-1]['cancelled'] is True
+    assert not target.exists()
@@ -0,0 +1,130 @@
+import hashlib
+import os
+import threading
+
+import pytest
+
+from ped_engine import CopyEngine, CopyJournal
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / 'исходные' / 'смета.xlsx'
+    path.parent.mkdir()
+    path.write_bytes(os.urandom(300_000))
+    return path
+
+
+@pytest.fixture
+def target_dir(tmp_path):
+    path = tmp_path / 'результат'
+    path.mkdir()
+    return path
+
+
+def copy(engine, source, target, journal=None):
+    return engine.copy_all([(str(source), str(target), source.name)], journal=journal)
+
+
+def manifest(target_dir):
+    return (target_dir / CopyJournal.MANIFEST).read_text(encoding='utf-8').splitlines()
+
+
+def test_copy_without_journal(source, target_dir, logger):
+    target = target_dir / 'ЛС-01.xlsx'
+    assert copy(CopyEngine(logger), source, target)['success'] == 1
+    assert target.read_bytes() == source.read_bytes()
+    assert not os.path.exists(str(target) + CopyEngine.PART_SUFFIX)
+    assert os.stat(target).st_mtime_ns == os.stat(source).st_mtime_ns
+
+
+def test_journal_writes_manifest_and_skips_verified_copy(source, target_dir, logger):
+    target = target_dir / 'ЛС-01.xlsx'
+    engine = CopyEngine(logger)
+    assert copy(engine, source, target, CopyJournal(target_dir))['success'] == 1
+    sha256 = hashlib.sha256(source.read_bytes()).hexdigest()
+    assert manifest(target_dir) == [f'{sha256}  ЛС-01.xlsx']
+    results = copy(engine, source, target, CopyJournal(target_dir))
+    assert results['verified'] == 1 and results['success'] == 0
+    assert manifest(target_dir) == [f'{sha256}  ЛС-01.xlsx']
+
+
+def test_changed_source_is_copied_again(source, target_dir, logger):
+    target = target_dir / 'ЛС-01.xlsx'
+    engine = CopyEngine(logger)
+    copy(engine, source, target, CopyJournal(target_dir))
+    source.write_bytes(b'new content')
+    assert copy(engine, source, target, CopyJournal(target_dir))['success'] == 1
+    assert target.read_bytes() == b'new content'
+
+
+def test_tampered_copy_with_same_size_and_mtime_is_copied_again(source, target_dir, logger, caplog):
+    target = target_dir / 'ЛС-01.xlsx'
+    engine = CopyEngine(logger)
+    copy(engine, source, target, CopyJournal(target_dir))
+    stat = os.stat(target)
+    data = bytearray(target.read_bytes())
+    data[1000] ^= 0xFF
+    target.write_bytes(bytes(data))
+    os.utime(target, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert copy(engine, source, target, CopyJournal(target_dir))['success'] == 1
+    assert target.read_bytes() == source.read_bytes()
+    assert 'копируется заново' in caplog.text
+
+
+def test_interrupted_part_is_resumed(source, target_dir, logger):
+    target = target_dir / 'ЛС-01.xlsx'
+    content = source.read_bytes()
+    journal = CopyJournal(target_dir)
+    journal.open()
+    journal.plan(str(source), str(target), os.stat(source))
+    journal.close()
+    # прерванный запуск оставил половину файла
+    part = str(target) + CopyEngine.PART_SUFFIX
+    with open(part, 'wb') as f:
+        f.write(content[:len(content) // 2])
+    copied = []
+    results = CopyEngine(logger).copy_all([(str(source), str(target), source.name)],
+                                          progress=lambda done, total: copied.append(done),
+                                          journal=CopyJournal(target_dir))
+    assert results['success'] == 1
+    assert target.read_bytes() == content
+    assert not os.path.exists(part)
+    # дописана только вторая половина
+    assert copied[0] == len(content) // 2 and copied[-1] == len(content)
+    assert manifest(target_dir) == [f'{hashlib.sha256(content).hexdigest()}  ЛС-01.xlsx']
+
+
+def test_corrupt_part_is_copied_from_start(source, target_dir, logger, caplog):
+    target = target_dir / 'ЛС-01.xlsx'
+    content = source.read_bytes()
+    journal = CopyJournal(target_dir)
+    journal.open()
+    journal.plan(str(source), str(target), os.stat(source))
+    journal.close()
+    # после сбоя в .part остались нули вместо данных
+    with open(str(target) + CopyEngine.PART_SUFFIX, 'wb') as f:
+        f.write(bytes(len(content) // 2))
+    engine = CopyEngine(logger)
+    assert copy(engine, source, target, CopyJournal(target_dir))['success'] == 1
+    assert target.read_bytes() == content
+    assert manifest(target_dir) == [f'{hashlib.sha256(content).hexdigest()}  ЛС-01.xlsx']
+    assert 'не совпадает с исходным файлом' in caplog.text
+    assert copy(engine, source, target, CopyJournal(target_dir))['verified'] == 1
+
+
+def test_part_of_another_source_is_not_resumed(source, target_dir, logger):
+    target = target_dir / 'ЛС-01.xlsx'
+    with open(str(target) + CopyEngine.PART_SUFFIX, 'wb') as f:
+        f.write(b'garbage' * 1000)
+    assert copy(CopyEngine(logger), source, target, CopyJournal(target_dir))['success'] == 1
+    assert target.read_bytes() == source.read_bytes()
+
+
+def test_cancelled_copy_is_skipped(source, target_dir, logger):
+    target = target_dir / 'ЛС-01.xlsx'
+    cancelled = threading.Event()
+    cancelled.set()
+    results = CopyEngine(logger).copy_all([(str(source), str(target), source.name)],
+                                          cancelled=cancelled, journal=CopyJournal(target_dir))
+    assert results['skipped'] == 1 and not target.exists()
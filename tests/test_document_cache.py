@@ -0,0 +1,44 @@
+from ped_engine import DocumentCache
+
+
+class Reader:
+    def __init__(self, rows):
+        self.rows = rows
+        self.calls = []
+
+    def __call__(self, filepath, max_rows):
+        self.calls.append(max_rows)
+        return self.rows[:max_rows]
+
+
+def test_deeper_read_only_when_needed(tmp_path):
+    path = tmp_path / 'смета.xlsx'
+    path.write_bytes(b'x')
+    reader = Reader([f'строка {i}' for i in range(100)])
+    cache = DocumentCache(reader)
+    assert len(cache.get_rows(path, 20)) == 20
+    assert len(cache.get_rows(path, 10)) == 20
+    assert reader.calls == [20]
+    assert len(cache.get_rows(path)) == 100
+    assert len(cache.get_rows(path, 20)) == 100
+    assert reader.calls == [20, None]
+
+
+def test_short_sheet_is_not_read_again(tmp_path):
+    path = tmp_path / 'смета.xlsx'
+    path.write_bytes(b'x')
+    reader = Reader(['шапка', 'итого'])
+    cache = DocumentCache(reader)
+    cache.get_rows(path, 20)
+    assert cache.get_rows(path) == ['шапка', 'итого']
+    assert reader.calls == [20]
+
+
+def test_size_limit_counts_replaced_entries(tmp_path):
+    path = tmp_path / 'смета.xlsx'
+    path.write_bytes(b'x')
+    cache = DocumentCache(Reader(['a' * 10] * 100), max_chars=500)
+    cache.get_rows(path, 20)
+    assert cache._chars == 200
+    cache.get_rows(path)  # весь лист больше лимита и не кэшируется
+    assert cache._chars == 0
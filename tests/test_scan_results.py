@@ -0,0 +1,64 @@
+import os
+
+from ped_engine import ScanResults, is_valid_new_name
+
+ROOT = os.path.abspath('пакет')
+
+
+def put(results, path, type='1', new_name='ЛС-01', replace=True, **data):
+    return results.put(dict(filepath=os.path.join(ROOT, path), type=type, mask='М', new_name=new_name,
+                            extension=os.path.splitext(path)[1].lower(), **data), replace=replace)
+
+
+def test_records_are_keyed_by_relative_path():
+    results = ScanResults(ROOT)
+    put(results, os.path.join('а', 'смета.xlsx'), new_name='А')
+    put(results, os.path.join('б', 'смета.xlsx'), new_name='Б')
+    assert len(results) == 2
+    assert results.get(os.path.join('а', 'смета.xlsx')).new_name == 'А'
+    assert [record.path for record in results.by_type('1')] == [
+        os.path.join('а', 'смета.xlsx'), os.path.join('б', 'смета.xlsx')]
+
+
+def test_put_keeps_manual_edit_and_respects_replace():
+    results = ScanResults(ROOT)
+    record = put(results, 'смета.xlsx', pending=True)
+    record.edited_name = 'Моё.xlsx'
+    put(results, 'смета.xlsx', new_name='ЛС-02')
+    assert record.final_name == 'Моё.xlsx' and record.new_name == 'ЛС-02' and not record.pending
+    put(results, 'смета.xlsx', new_name='ЛС-03', replace=False)
+    assert record.new_name == 'ЛС-02'
+
+
+def test_share_xls_info_prefers_xlsx_and_skips_other_folders():
+    results = ScanResults(ROOT)
+    put(results, 'смета.xls', type='2', new_name='ОС-01')
+    put(results, 'смета.xlsx', type='1', new_name='ЛС-01')
+    pdf = put(results, 'смета.pdf', type='?', new_name='?')
+    other = put(results, os.path.join('папка', 'смета.pdf'), type='?', new_name='?')
+    results.share_xls_info()
+    assert (pdf.type, pdf.new_name) == ('1', 'ЛС-01')
+    assert (other.type, other.new_name) == ('?', '?')
+    assert [record.path for record in results.by_type('?')] == [other.path]
+
+
+def test_ready_for_copy():
+    results = ScanResults(ROOT)
+    ready = put(results, 'а.xlsx', new_name='ЛС-01')
+    put(results, 'б.xlsx', new_name='ЛС-02')
+    put(results, 'в.xlsx', new_name='ЛС-02')  # совпадает с б.xlsx
+    put(results, 'г.xlsx', type='?', new_name='?')
+    put(results, 'д.xlsx', new_name='ЛС-??')
+    edited = put(results, 'е.xlsx', type='?', new_name='?')
+    edited.edited_name = 'Правка.xlsx'
+    put(results, 'ж.xlsx', new_name='ЛС-03', duplicate_of=os.path.join(ROOT, 'а.xlsx'))
+    put(results, 'з.xlsx', pending=True, new_name='ЛС-04')
+    assert [record.path for record in results.ready_for_copy()] == [ready.path, edited.path]
+
+
+def test_is_valid_new_name():
+    assert is_valid_new_name('ЛС-02-01-01-БАЗ(ex. файл..).xlsx', '.xlsx')
+    assert not is_valid_new_name('ЛС-??.xlsx', '.xlsx')
+    assert not is_valid_new_name('ЛС.pdf', '.xlsx')
+    assert not is_valid_new_name('ЛС/1.xlsx', '.xlsx')
+    assert not is_valid_new_name(' .xlsx', '.xlsx')
@@ -0,0 +1,167 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from ped_engine import FileClassifier, ScanCache, ScanResults, Scanner, TagsManager
+
+
+def write(root, relpath, content=b'x'):
+    path = Path(root, relpath)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(content)
+    return path
+
+
+def run(scanner):
+    results = ScanResults(scanner.directory)
+    cancelled = scanner.run(on_progress=lambda files_count, total, batch: [results.put(data) for data in batch])
+    return results, cancelled
+
+
+def test_collect_files_in_walk_order_with_filters(tmp_path, classifier):
+    for relpath in ['б.pdf', 'а.xlsx', 'Thumbs.db', '~$а.xlsx', 'чертеж.dwg',
+                    os.path.join('в', 'г.pdf'), os.path.join('в', 'д', 'е.pdf'), os.path.join('архив', 'ж.pdf')]:
+        write(tmp_path, relpath)
+    scanner = Scanner(str(tmp_path), classifier, exclude=['архив'])
+    files, stats, skipped = scanner._collect_files()
+    names = [name for name, _ in files]
+    assert sorted(names) == ['а.xlsx', 'б.pdf', 'г.pdf', 'е.pdf']
+    # файлы папки идут раньше файлов ее подпапок, как в os.walk
+    assert names.index('г.pdf') < names.index('е.pdf')
+    assert {names.index('а.xlsx'), names.index('б.pdf')} == {0, 1}
+    assert skipped == 3
+    assert [stat.st_size for stat in stats] == [path.stat().st_size for _, path in files]
+
+
+def test_include_globs(tmp_path, classifier):
+    write(tmp_path, 'а.pdf')
+    write(tmp_path, 'б.xlsx')
+    files, _, skipped = Scanner(str(tmp_path), classifier, include=['*.pdf'])._collect_files()
+    assert [name for name, _ in files] == ['а.pdf'] and skipped == 1
+
+
+def test_find_duplicates_groups_by_content(tmp_path, classifier):
+    big = os.urandom(Scanner.DEDUP_BLOCK * 3)
+    changed_middle = big[:Scanner.DEDUP_BLOCK + 5] + b'!' + big[Scanner.DEDUP_BLOCK + 6:]
+    for relpath, content in [('1.pdf', b'same'), ('2.pdf', b'same'), ('3.pdf', b'diff'),
+                             ('4.bin', big), ('5.bin', changed_middle), ('6.bin', big), ('7.pdf', b'')]:
+        write(tmp_path, relpath, content)
+    scanner = Scanner(str(tmp_path), classifier)
+    files, stats, _ = scanner._collect_files()
+    index = {name: i for i, (name, _) in enumerate(files)}
+    duplicates = scanner._find_duplicates(files, stats)
+    first = min(index['1.pdf'], index['2.pdf'])
+    assert duplicates == {
+        max(index['1.pdf'], index['2.pdf']): first,
+        max(index['4.bin'], index['6.bin']): min(index['4.bin'], index['6.bin']),
+    }
+
+
+def test_copies_take_type_but_not_name_of_first_file(tmp_path):
+    classifier = FileClassifier(TagsManager(), __import__('logging').getLogger('PEDSorter.tests'),
+                                search_in_file=False)
+    write(tmp_path, os.path.join('а', 'КП поставщика.pdf'), b'same')
+    write(tmp_path, os.path.join('б', 'в', 'КП поставщика копия.pdf'), b'same')
+    results, cancelled = run(Scanner(str(tmp_path), classifier))
+    assert not cancelled
+    plain = results.get(os.path.join('а', 'КП поставщика.pdf'))
+    renamed = results.get(os.path.join('б', 'в', 'КП поставщика копия.pdf'))
+    # разбирается первый по обходу файл, второй получает его тип
+    first, copy = (plain, renamed) if renamed.duplicate_of else (renamed, plain)
+    assert copy.duplicate_of == first.path and first.duplicate_of is None
+    assert plain.type == renamed.type == 'Коммерческое предложение'
+    assert plain.new_name != renamed.new_name
+    assert '(ex. КП поставщика.p' in plain.new_name
+    assert '(ex. КП поставщика к' in renamed.new_name
+
+
+def test_parallel_results_keep_walk_order(tmp_path, tags_manager, logger):
+    for i in range(30):
+        write(tmp_path, os.path.join(f'папка{i % 3}', f'лс {i:02}.pdf'), str(i).encode())
+    classifier = FileClassifier(tags_manager, logger, search_in_file=False)
+    scanner = Scanner(str(tmp_path), classifier, workers=3)
+    files, _, _ = scanner._collect_files()
+    detected = list(scanner._detect_parallel(files))
+    assert [data['filepath'] for data in detected] == [path for _, path in files]
+    assert {data['type'] for data in detected} == {'Локальная смета'}
+
+
+def test_failed_reads_are_not_cached(tmp_path, tags_manager, logger):
+    # повреждённая книга: ошибка чтения (или нет openpyxl) не должна попасть в кэш
+    write(tmp_path, os.path.join('пакет', 'лс 1.xlsx'), b'not a workbook')
+    write(tmp_path, os.path.join('пакет', 'кп.pdf'), b'pdf')
+    classifier = FileClassifier(tags_manager, logger, search_in_file=False)
+    cache = ScanCache(tmp_path / 'scan_cache.sqlite', classifier.config_key(), logger=logger)
+    root = str(tmp_path / 'пакет')
+    run(Scanner(root, classifier, scan_cache=cache))
+    scanner = Scanner(root, classifier, scan_cache=cache)
+    results, _ = run(scanner)
+    assert results.get('лс 1.xlsx').type == 'Локальная смета'
+    assert scanner.report.cached == 1  # только кп.pdf
+    assert scanner.report.files == 2
+
+
+def test_broken_cache_falls_back_to_scan_without_cache(tmp_path, classifier, logger, caplog):
+    write(tmp_path, os.path.join('пакет', 'лс.pdf'))
+    db_path = tmp_path / 'scan_cache.sqlite'
+    db_path.write_bytes(b'not a database' * 100)
+    cache = ScanCache(db_path, classifier.config_key(), logger=logger)
+    results, cancelled = run(Scanner(str(tmp_path / 'пакет'), classifier, scan_cache=cache))
+    assert not cancelled and results.get('лс.pdf').type == 'Локальная смета'
+    assert 'поиск без кэша' in caplog.text
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_report_counts_stages(tmp_path, classifier, workers):
+    for i in range(4):
+        write(tmp_path, f'лс {i}.pdf', str(i).encode())
+    scanner = Scanner(str(tmp_path), classifier, workers=workers)
+    run(scanner)
+    stages = {row['stage']: row for row in scanner.report.stages()}
+    assert stages['enumerate']['count'] == 1
+    assert stages['tags']['count'] == 4
+    assert stages['naming']['count'] == 4
+    assert len(scanner.report.slowest()) == 4
+
+
+def test_file_that_fails_detection_stays_unknown(tmp_path, classifier, monkeypatch):
+    write(tmp_path, 'лс.pdf', b'text')
+    write(tmp_path, 'скан.pdf', b'scan')
+    detect = classifier.detect
+
+    def failing_detect(filepath, filename):
+        if filename == 'скан.pdf':
+            raise ModuleNotFoundError("No module named 'pytesseract'")
+        return detect(filepath, filename)
+
+    monkeypatch.setattr(classifier, 'detect', failing_detect)
+    results, _ = run(Scanner(str(tmp_path), classifier))
+    assert len(results) == 2
+    assert results.get('лс.pdf').type == 'Локальная смета'
+    failed = results.get('скан.pdf')
+    assert (failed.type, failed.new_name, failed.pending) == ('?', '?', False)
+
+
+@pytest.mark.parametrize('texts, failed', [
+    (['', 'коммерческое предложение'], False),  # шапка пустая, вся страница распознана
+    (['', 'прочий текст'], False),
+    (['', ''], True),
+])
+def test_ocr_fails_only_when_no_pass_gives_text(tmp_path, classifier, monkeypatch, texts, failed):
+    path = write(tmp_path, 'скан.pdf')
+    passes = iter(texts)
+    monkeypatch.setattr(classifier, 'extract_text_from_pdf_first_page', lambda *args, **kwargs: next(passes))
+    classifier._read_failed = False
+    classifier.check_tags_in_pdf_ocr(path)
+    assert classifier._read_failed is failed
+
+
+def test_include_glob_brings_back_skipped_extensions(tmp_path, classifier):
+    write(tmp_path, 'КП поставщика.jpg')
+    write(tmp_path, 'ТС.tif')
+    write(tmp_path, 'лс.pdf')
+    files, _, skipped = Scanner(str(tmp_path), classifier)._collect_files()
+    assert [name for name, _ in files] == ['лс.pdf'] and skipped == 2
+    files, _, skipped = Scanner(str(tmp_path), classifier, include=['*.pdf', '*.jpg', '*.tif'])._collect_files()
+    assert sorted(name for name, _ in files) == ['КП поставщика.jpg', 'ТС.tif', 'лс.pdf'] and skipped == 0
@@ -0,0 +1,55 @@
+import logging
+
+from ped_engine import TagsManager
+
+
+def make_tags(*internal_tags):
+    return TagsManager({str(i): {"type": f"тип {i}", "name_tags": [], "internal_tags": [tag], "mask": "М"}
+                        for i, tag in enumerate(internal_tags)})
+
+
+def test_name_tags_match_words_and_phrases(tags_manager):
+    assert tags_manager.find_name_tags('ЛС 02-01-01.xlsx') == {'1'}
+    assert tags_manager.find_name_tags('Локальная_смета-5.xls') == {'1'}
+    assert tags_manager.find_name_tags('КП поставщика.pdf') == {'8.3'}
+    # слово целиком, а не часть слова
+    assert tags_manager.find_name_tags('лсх.pdf') == set()
+
+
+def test_internal_tags_report_first_row(tags_manager):
+    rows = ['шапка', 'объектная смета № 1', 'локальная смета', 'объектная  смета']
+    assert tags_manager.find_internal_tags(rows) == {'2': 1, '1': 2}
+    assert tags_manager.find_internal_tags([]) == {}
+
+
+def test_tags_of_different_types_at_same_position():
+    tags = make_tags('смета', 'смета №')
+    assert tags.find_internal_tags(['смета № 5']) == {'0': 0, '1': 0}
+
+
+def test_regex_tags_that_cannot_be_combined_still_match():
+    tags = make_tags('(?i)сводн\\w+ расч', '(\\d)-\\1', '(?P<x>ab)c', 'ведомость')
+    assert tags.find_internal_tags(['Сводный расчет', '7-7', 'abc', 'ведомость']) == {
+        '0': 0, '1': 1, '2': 2, '3': 3}
+    assert tags.find_internal_tags(['7-8']) == {}
+
+
+def test_invalid_regex_is_reported_and_rejected(caplog):
+    with caplog.at_level(logging.WARNING, logger='PEDSorter'):
+        tags = make_tags('[не закрыта', 'ведомость')
+    assert 'неправильное регулярное выражение' in caplog.text
+    assert tags.find_internal_tags(['[не закрыта']) == {'0': 0}
+    assert tags.tag_error('(не закрыта') is not None
+    assert tags.tag_error('обычный текст') is None
+    tags._save_tags = lambda data: None
+    assert not tags.add_tag('1', '(не закрыта', 'internal_tags')
+    assert tags.add_tag('1', 'дефектн[а-яё]* ведом', 'internal_tags')
+    assert tags.find_internal_tags(['дефектная ведомость']) == {'1': 0}
+
+
+def test_snapshot_is_independent(tags_manager):
+    snapshot = tags_manager.snapshot()
+    tags_manager.tags_data['1']['internal_tags'].append('новый тэг')
+    tags_manager._build_matchers()
+    assert snapshot.find_internal_tags(['новый тэг']) == {}
+    assert tags_manager.find_internal_tags(['новый тэг']) == {'1': 0}